@@ -13,3 +13,4 @@ from .record import RecordItem
 from .site import Site
 from .sqlalchemy import SQLAlchemyCollection
 from .sqlalchemy import SQLAlchemyItem
+from .traverser import Traverser
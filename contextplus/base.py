@@ -3,6 +3,7 @@
 centered around a URL traversal system.
 """
 
+from . import exc
 from .behaviour.acquisition import AcquisitionBehaviour
 from .behaviour.events import EventsBehaviour
 from .behaviour.logging import LoggingBehaviour
@@ -22,14 +23,14 @@ class Base(
     Designed to apply common functions to all domain objects.
     """
 
+    # Seconds an instance is kept in the resource cache, None for the default
+    cache_ttl = None
+
     @classmethod
     def get_meta_title(cls):
         """A human readable title of the kind of object"""
         return cls.__name__
 
-    name = None
-    parent = None
-
     @property
     def title(self):
         """A human readable title of this object instance"""
@@ -70,6 +71,65 @@ class Base(
         """Allow setting the name"""
         self.name = name
 
+    def traverse_path(self, names) -> tuple:
+        """Traverse from this object along names as far as possible
+
+        The resource cache (if one can be acquired) is probed for the longest
+        cached prefix of the path, starting with the full path, so that only
+        the remaining names are traversed with ``__getitem__``. The probes are
+        not recorded in the cache stats or trace, only the lookup of the
+        prefix found is. As with
+        Pyramid's traverser, traversal stops at an object without
+        ``__getitem__`` or when it raises KeyError.
+
+        Args:
+            names (iterable): The path names relative to this object
+
+        Returns:
+            tuple: (context, traversed) where context is the deepest object
+            found and traversed is the number of names it took to get there
+        """
+        names = tuple(names)
+        context = self
+        traversed = 0
+        resource_cache = self.acquire_get("resource_cache")
+        resource_cache_get = self.acquire_get("resource_cache_get")
+        if resource_cache is not None and resource_cache_get is not None and names:
+            path_names = self.path_names
+            for end in range(len(names), 0, -1):
+                key = path_names + names[:end]
+                # peek without recording a lookup, then record the one which hit
+                if resource_cache.get(key) is not None:
+                    cached = resource_cache_get(key)
+                    if cached is not None:
+                        context = cached
+                        traversed = end
+                    break
+        for name in names[traversed:]:
+            try:
+                getitem = context.__getitem__
+            except AttributeError:
+                # a leaf, the rest of the names are a view name and subpath
+                break
+            try:
+                context = getitem(name)
+            except KeyError:
+                break
+            traversed += 1
+        return context, traversed
+
+    def resolve_path(self, names):
+        """Return the object found by traversing names from this object
+
+        Raises:
+            TraversalKeyError: If a name along the path can not be found
+        """
+        names = tuple(names)
+        context, traversed = self.traverse_path(names)
+        if traversed < len(names):
+            raise exc.TraversalKeyError(names[traversed])
+        return context
+
     def __repr__(self):
         module = self.__class__.__module__
         class_name = self.__class__.__name__
@@ -60,3 +60,48 @@ class TestBaseWithParent(TestCase):
 
     def test_root(self):
         self.assertEqual(self.child.root, self.parent)
+
+
+class TestBaseResolvePath(TestCase):
+    def setUp(self):
+        class Node(base.Base):
+            def __getitem__(self, key):
+                if key.startswith("n"):
+                    return Node(self, key)
+                return super().__getitem__(key)
+
+        self.Node = Node
+        self.root = Node(None, "")
+
+    def test_resolve_path(self):
+        node = self.root.resolve_path(["n1", "n2"])
+        self.assertEqual(node.path_names, ("", "n1", "n2"))
+        self.assertIs(self.root.resolve_path([]), self.root)
+        with self.assertRaises(KeyError):
+            self.root.resolve_path(["n1", "x", "n2"])
+
+    def test_traverse_path(self):
+        context, traversed = self.root.traverse_path(["n1", "x", "n2"])
+        self.assertEqual(context.path_names, ("", "n1"))
+        self.assertEqual(traversed, 1)
+
+    def test_traverse_path_cached_prefix(self):
+        cached = self.Node(self.Node(self.root, "n1"), "n2")
+        cache = {cached.path_names: cached}
+        self.root.resource_cache = cache
+        self.root.resource_cache_get = cache.get
+        context, traversed = self.root.traverse_path(["n1", "n2", "n3"])
+        self.assertEqual(traversed, 3)
+        self.assertIs(context.parent, cached)
+        self.assertIs(self.root.resolve_path(["n1", "n2"]), cached)
+
+    def test_traverse_path_leaf(self):
+        class Report(object):
+            pass
+
+        report = Report()
+        self.root.resource_cache = {("", "report"): report}
+        self.root.resource_cache_get = self.root.resource_cache.get
+        context, traversed = self.root.traverse_path(["report", "csv"])
+        self.assertIs(context, report)
+        self.assertEqual(traversed, 1)
@@ -13,11 +13,59 @@ content sources.
 """
 
 from .. import exc
+from . import traversal
 
 import itertools
 
 
 _MISSING_ATTRIBUTE = object()  # an object representing no returned attribute
+_NOT_CACHED = object()  # an object representing no cached provider
+
+_generation = 0
+
+
+def invalidate_acquisition():
+    """Drop every cached acquisition result in the process
+
+    Acquisition results are cached per object until the parent of the object,
+    or of any of its ancestors, changes. Call this after adding or removing an
+    attribute on an ancestor which descendants may already have acquired from
+    elsewhere.
+    """
+    global _generation
+    _generation += 1
+
+
+def _class_attribute_names(cls):
+    """Return the set of attribute names available on a class (cached on the class)"""
+    names = cls.__dict__.get("_acquisition_class_attribute_names")
+    if names is None:
+        names = frozenset(dir(cls))
+        cls._acquisition_class_attribute_names = names
+    return names
+
+
+def _has_attribute(node, name):
+    """Test if node might have the attribute without raising an exception"""
+    cls = type(node)
+    if isinstance(node, AcquisitionBehaviour) and not hasattr(cls, "__getattr__"):
+        return (
+            name in cls.acquisition_provides
+            or name in _class_attribute_names(cls)
+            or name in getattr(node, "__dict__", ())
+        )
+    return getattr(node, name, _MISSING_ATTRIBUTE) is not _MISSING_ATTRIBUTE
+
+
+def _find_provider(node, name):
+    """Return the first of node and its ancestors which provides name, or None"""
+    while node is not None:
+        if isinstance(node, AcquisitionBehaviour):
+            return node.acquire_provider(name)
+        if _has_attribute(node, name):
+            return node
+        node = getattr(node, "parent", None)
+    return None
 
 
 class AcquisitionProxy(object):
@@ -34,7 +82,14 @@ class AcquisitionProxy(object):
         self._subject = subject
 
     def __getattr__(self, name: str):
-        nodes = itertools.chain([self._subject], self._subject.iter_ancestors())
+        subject = self._subject
+        if isinstance(subject, AcquisitionBehaviour):
+            value = subject.acquire_get(name, _MISSING_ATTRIBUTE)
+            if value is not _MISSING_ATTRIBUTE:
+                return value
+            raise exc.AcquisitionAttributeError(name)
+
+        nodes = itertools.chain([subject], subject.iter_ancestors())
         for current in nodes:
             value = getattr(current, name, _MISSING_ATTRIBUTE)
             if value is not _MISSING_ATTRIBUTE:
@@ -46,7 +101,58 @@ class AcquisitionProxy(object):
 
 
 class AcquisitionBehaviour(object):
+    """Acquire attributes from self or the nearest ancestor which has them
+
+    The object providing an attribute (or the fact that no object provides
+    it) is cached per object, so repeated lookups go straight to the provider.
+    Values are always read from the provider so they are never stale. The
+    cache is dropped when the parent of the object or of an ancestor changes,
+    or when ``invalidate_acquisition`` is called.
+    """
+
+    # Attribute names which instances of this class provide to descendants.
+    # These do not need to exist on the class, e.g. attributes set in __init__.
+    acquisition_provides = ()
+
+    _acquisition_proxy = None
+    _acquisition_providers = None
+    _acquisition_parent = None
+    _acquisition_generation = None
+
     @property
     def acquire(self):
         """Return the acquisition proxy from self"""
-        return AcquisitionProxy(self)
+        proxy = self._acquisition_proxy
+        if proxy is None:
+            proxy = self._acquisition_proxy = AcquisitionProxy(self)
+        return proxy
+
+    def acquire_provider(self, name: str):
+        """Return the object which provides name for self, or None"""
+        parent = getattr(self, "parent", None)
+        providers = self._acquisition_providers
+        generation = (_generation, traversal.traversal_token(self))
+        if (
+            providers is None
+            or self._acquisition_parent is not parent
+            or self._acquisition_generation != generation
+        ):
+            providers = self._acquisition_providers = {}
+            self._acquisition_parent = parent
+            self._acquisition_generation = generation
+
+        provider = providers.get(name, _NOT_CACHED)
+        if provider is _NOT_CACHED:
+            if _has_attribute(self, name):
+                provider = self
+            else:
+                provider = _find_provider(parent, name)
+            providers[name] = provider
+        return provider
+
+    def acquire_get(self, name: str, default=None):
+        """Return an acquired attribute or default, without raising AttributeError"""
+        provider = self.acquire_provider(name)
+        if provider is None:
+            return default
+        return getattr(provider, name, default)
@@ -1,6 +1,7 @@
 # -*- coding:utf-8 -*-
 
 from . import acquisition
+from . import traversal
 from unittest import TestCase
 
 
@@ -32,3 +33,83 @@ class TestAcquisition(TestCase):
         self.assertEqual(acquire.__dict__["shape"], "circle")
         self.assertEqual(acquire.__dict__["colour"], "blue")
         self.assertEqual(acquire.__dict__["size"], "big")
+
+
+class TestAcquisitionBehaviour(TestCase):
+    def setUp(self):
+        class Node(acquisition.AcquisitionBehaviour):
+            def __init__(self, parent=None, **kwargs):
+                self.parent = parent
+                self.__dict__.update(kwargs)
+
+        class Provider(Node):
+            acquisition_provides = ("db_session",)
+
+        self.Node = Node
+        self.root = Provider(db_session="session", colour="blue")
+        self.mid = Node(self.root, shape="triangle")
+        self.leaf = Node(self.mid)
+
+    def test_acquire(self):
+        acquire = self.leaf.acquire
+        self.assertIs(self.leaf.acquire, acquire)
+        self.assertEqual(acquire.db_session, "session")
+        self.assertEqual(acquire.shape, "triangle")
+        with self.assertRaises(AttributeError):
+            acquire.foo
+        self.assertEqual(self.leaf.acquire_get("foo", "default"), "default")
+
+    def test_provider_cached(self):
+        self.assertIs(self.leaf.acquire_provider("colour"), self.root)
+        self.assertIs(self.leaf._acquisition_providers["colour"], self.root)
+        self.assertIs(self.mid._acquisition_providers["colour"], self.root)
+        self.assertIsNone(self.leaf.acquire_provider("foo"))
+        self.assertIn("foo", self.leaf._acquisition_providers)
+
+        # values are read from the provider
+        self.root.colour = "red"
+        self.assertEqual(self.leaf.acquire.colour, "red")
+
+    def test_invalidate_parent_changed(self):
+        self.assertEqual(self.leaf.acquire.shape, "triangle")
+        self.leaf.parent = self.Node(self.root, shape="square")
+        self.assertEqual(self.leaf.acquire.shape, "square")
+
+    def test_invalidate_acquisition(self):
+        self.assertIsNone(self.leaf.acquire_get("foo"))
+        self.root.foo = "found"
+        self.assertIsNone(self.leaf.acquire_get("foo"))
+        acquisition.invalidate_acquisition()
+        self.assertEqual(self.leaf.acquire_get("foo"), "found")
+
+    def test_foreign_ancestors(self):
+        class Foreign(object):
+            parent = None
+            size = "big"
+
+        self.root.parent = Foreign()
+        self.assertEqual(self.leaf.acquire.size, "big")
+
+
+class TestAcquisitionTraversal(TestCase):
+    def setUp(self):
+        class Node(acquisition.AcquisitionBehaviour, traversal.TraversalBehaviour):
+            def __init__(self, parent=None, name=None, **kwargs):
+                self.parent = parent
+                self.name = name
+                self.__dict__.update(kwargs)
+
+        self.Node = Node
+        self.root = Node(colour="blue")
+        self.left = Node(self.root, "left", shape="square")
+        self.right = Node(self.root, "right", shape="circle")
+        self.leaf = Node(self.left, "leaf")
+
+    def test_invalidate_subtree_only(self):
+        self.assertEqual(self.leaf.acquire.colour, "blue")
+        self.assertEqual(self.right.acquire.colour, "blue")
+        providers = self.right._acquisition_providers
+        self.left.parent = self.Node(colour="red")
+        self.assertEqual(self.leaf.acquire.colour, "red")
+        self.assertEqual(self.right.acquire.colour, "blue")
+        self.assertIs(self.right._acquisition_providers, providers)
@@ -13,6 +13,8 @@ class Foo(DomainBase):
 
 """
 
+from . import traversal
+
 
 class Event(object):
     def __init__(self, target, name, data):
@@ -29,10 +31,22 @@ class HandlerDecorator(object):
         self.priority = priority
 
     def match(self, event):
+        return self.match_name(event.name)
+
+    def match_name(self, event_name):
+        """Test an event name against event_names
+
+        An event name ending in ``*`` matches every event name starting with
+        the text before the ``*``, e.g. ``workflow-after-*``.
+        """
         if self.event_names is None:
             return True
-        else:
-            return event.name in self.event_names
+        for pattern in self.event_names:
+            if pattern == event_name:
+                return True
+            if pattern.endswith("*") and event_name.startswith(pattern[:-1]):
+                return True
+        return False
 
     def __get__(self, inst, owner):
         """Some serious depp python stuff going on here....
@@ -64,48 +78,180 @@ def handle(*event_names, priority=None):
     return config_handler
 
 
+class HandlerTable(object):
+    """The event handlers declared on a class indexed by event name
+
+    Handlers are kept in the order they are called: handlers with a priority
+    sorted by priority, then handlers without a priority. The handlers which
+    can fire for an event name, including handlers for every event, are
+    worked out in calling order the first time that name is emitted and kept
+    for later emits.
+    """
+
+    def __init__(self, handlers):
+        """Initialize the table
+
+        Args:
+            handlers (list): HandlerDecorator instances in calling order
+        """
+        self.handlers = tuple(handlers)
+        self.by_event_name = {}
+
+    def match(self, event_name):
+        """Return a tuple of handlers which can fire for the event name"""
+        matches = self.by_event_name.get(event_name)
+        if matches is None:
+            matches = tuple(h for h in self.handlers if h.match_name(event_name))
+            self.by_event_name[event_name] = matches
+        return matches
+
+
+def get_handler_table(cls):
+    """Return the HandlerTable for a class
+
+    The table is built once per class by scanning the class attributes and is
+    then stored on the class itself.
+    """
+    table = cls.__dict__.get("_handler_table")
+    if table is not None:
+        return table
+    ordered = []
+    unordered = []
+    for cls_name in dir(cls):
+        cls_item = getattr(cls, cls_name, None)
+        if isinstance(cls_item, HandlerDecorator):
+            if cls_item.priority is not None:
+                ordered.append(cls_item)
+            else:
+                unordered.append(cls_item)
+    ordered.sort(key=lambda h: h.priority)
+    table = HandlerTable([*ordered, *unordered])
+    cls._handler_table = table
+    return table
+
+
+class HandlerChain(object):
+    """The handler table of a class linked to the handler chain of the nearest
+    ancestor which handles events.
+
+    Chains are shared: there is one chain per class and parent chain, so every
+    child of the same type under a collection uses the same chain object and
+    holds no handler list of its own. Levels in a chain count event handling
+    nodes upwards from the emitting object, 0 being the object itself.
+    """
+
+    def __init__(self, table, parent=None):
+        """Initialize the chain
+
+        Args:
+            table (HandlerTable): The handlers of the class at this level
+            parent (HandlerChain): The chain of the nearest event handling ancestor
+        """
+        self.table = table
+        self.parent = parent
+        self._children = {}
+        self._matches = {}
+
+    def child(self, cls):
+        """Return the shared chain for an object of type cls below this chain"""
+        chain = self._children.get(cls)
+        if chain is None:
+            chain = self._children[cls] = HandlerChain(get_handler_table(cls), self)
+        return chain
+
+    def match(self, event_name):
+        """Return a tuple of (level, HandlerDecorator) which can fire for the event name"""
+        matches = self._matches.get(event_name)
+        if matches is None:
+            matches = [(0, h) for h in self.table.match(event_name)]
+            if self.parent is not None:
+                matches.extend(
+                    (level + 1, h) for level, h in self.parent.match(event_name)
+                )
+            matches = self._matches[event_name] = tuple(matches)
+        return matches
+
+
+_root_handler_chains = {}
+
+
+def get_root_handler_chain(cls):
+    """Return the shared chain for an object of type cls with no event handling ancestors"""
+    chain = _root_handler_chains.get(cls)
+    if chain is None:
+        chain = _root_handler_chains[cls] = HandlerChain(get_handler_table(cls))
+    return chain
+
+
 class EventsBehaviour(object):
     """THe behaviour class which add the ability to traverse named resources"""
 
-    _event_handlers = None
+    _handler_chain = None
+    _handler_chain_parent = None
+    _handler_chain_generation = None
+
+    def iter_event_nodes(self):
+        """Iterate through self and the ancestors which can handle events"""
+        yield self
+        current = getattr(self, "parent", None)
+        while current is not None:
+            if isinstance(current, EventsBehaviour):
+                yield current
+            current = getattr(current, "parent", None)
+
+    @property
+    def handler_chain(self):
+        """Return the shared HandlerChain of this object
+
+        The chain is looked up again when the parent of this object or of an
+        ancestor changes.
+        """
+        parent = getattr(self, "parent", None)
+        chain = self._handler_chain
+        generation = traversal.traversal_token(self)
+        if (
+            chain is not None
+            and self._handler_chain_parent is parent
+            and self._handler_chain_generation == generation
+        ):
+            return chain
+        nodes = self.iter_event_nodes()
+        next(nodes)
+        event_parent = next(nodes, None)
+        if event_parent is None:
+            chain = get_root_handler_chain(type(self))
+        else:
+            chain = event_parent.handler_chain.child(type(self))
+        self._handler_chain = chain
+        self._handler_chain_parent = parent
+        self._handler_chain_generation = generation
+        return chain
 
     @property
     def event_handlers(self):
-        """Returns a list of tuples of (EventDecorator instance, bound_handler) from this object
-        and ancestor objects from self.acquire.event_handlers
+        """Returns a list of tuples of (HandlerDecorator instance, bound_handler) from this
+        object and ancestor objects
         """
-        if self._event_handlers is not None:
-            return self._event_handlers
-
-        # Get event handlers for self
-        ordered = []
-        unordered = []
-        cls = type(self)
-        for cls_name in dir(cls):
-            cls_item = getattr(cls, cls_name, None)
-            if isinstance(cls_item, HandlerDecorator):
-                bound_handler = getattr(self, cls_name)
-                if cls_item.priority is not None:
-                    ordered.append((cls_item, bound_handler))
-                else:
-                    unordered.append((cls_item, bound_handler))
-        ordered.sort(key=lambda h: h[0].priority)
-
-        # get parent event handlers
-        try:
-            parent = self.parent.acquire.event_handlers
-        except AttributeError:
-            parent = []
-
-        # Combine, cache and return
-        handlers = [*ordered, *unordered, *parent]
-        self._event_handlers = handlers
+        handlers = []
+        chain = self.handler_chain
+        for node in self.iter_event_nodes():
+            cls = type(node)
+            for decorated in chain.table.handlers:
+                handlers.append((decorated, decorated.__get__(node, cls)))
+            chain = chain.parent
         return handlers
 
     def emit(self, name, data=None):
-        """Emit an event to event handlers from the property self.event_handlers"""
-        data = data or {}
-        event = Event(self, name, data)
-        for decorated, bound_handler in self.event_handlers:
-            if decorated.match(event):
-                bound_handler(event)
+        """Emit an event to the event handlers of this object and its ancestors
+
+        Only the handlers matched to the event name, which the handler chain
+        works out once per name, are looked at, so an event with no listeners
+        does very little work.
+        """
+        matches = self.handler_chain.match(name)
+        if not matches:
+            return
+        event = Event(self, name, data or {})
+        nodes = list(self.iter_event_nodes())
+        for level, decorated in matches:
+            decorated.handler(nodes[level], event)
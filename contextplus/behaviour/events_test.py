@@ -20,7 +20,7 @@ class TestEvent(TestCase):
 class TestHandlerDecorator(TestCase):
     def setUp(self):
         self.handler = MagicMock()
-        self.decorated = events.HandlerDecorator(name="click", handler=self.handler)
+        self.decorated = events.HandlerDecorator(event_names=("click",), handler=self.handler)
 
     def test_match_success(self):
         event = MagicMock()
@@ -48,58 +48,113 @@ class TestHandle(TestCase):
         function = MagicMock()
         decorated = events.handle("foo")(function)
         self.assertIsInstance(decorated, events.HandlerDecorator)
-        self.assertEqual(decorated.name, "foo")
+        self.assertEqual(decorated.event_names, ("foo",))
         self.assertEqual(decorated.handler, function)
 
 
+class TestHandlerTable(TestCase):
+    def setUp(self):
+        self.click = events.HandlerDecorator(MagicMock(), ("click",))
+        self.resize = events.HandlerDecorator(MagicMock(), ("resize", "click"))
+        self.anything = events.HandlerDecorator(MagicMock(), None)
+        self.table = events.HandlerTable([self.click, self.anything, self.resize])
+
+    def test_match(self):
+        self.assertEqual(
+            self.table.match("click"), (self.click, self.anything, self.resize)
+        )
+        self.assertEqual(self.table.match("resize"), (self.anything, self.resize))
+        self.assertEqual(self.table.match("scroll"), (self.anything,))
+
+    def test_match_pattern(self):
+        after = events.HandlerDecorator(MagicMock(), ("workflow-after-*", "click"))
+        table = events.HandlerTable([after, self.anything])
+        self.assertEqual(table.match("workflow-after-publish"), (after, self.anything))
+        self.assertEqual(table.match("workflow-before-publish"), (self.anything,))
+        self.assertEqual(table.match("click"), (after, self.anything))
+
+    def test_get_handler_table(self):
+        class Context(events.EventsBehaviour):
+            handle_b = events.handle("b")(MagicMock())
+            handle_a = events.handle("a")(MagicMock())
+            handle_c = events.handle("a", priority=2)(MagicMock())
+            handle_d = events.handle("a", priority=1)(MagicMock())
+
+        table = events.get_handler_table(Context)
+        self.assertIs(events.get_handler_table(Context), table)
+        self.assertEqual(
+            table.handlers,
+            (Context.handle_d, Context.handle_c, Context.handle_a, Context.handle_b),
+        )
+        self.assertEqual(
+            table.match("a"), (Context.handle_d, Context.handle_c, Context.handle_a)
+        )
+        self.assertEqual(table.match("c"), ())
+
+
 class TestEventsBehaviour(TestCase):
     def setUp(self):
 
         self.resize_handler = resize_handler = MagicMock(return_value="from resize")
         self.click_handler = click_handler = MagicMock(return_value="from click")
-        self.parent = MagicMock()
-
-        self.parent_handler = MagicMock(return_value="from parent click")
-        self.parent_handler_decorator = events.HandlerDecorator(
-            handler=self.parent_handler, name="click", priority=None
+        self.parent_handler = parent_handler = MagicMock(
+            return_value="from parent click"
         )
-        self.parent.acquire.event_handlers = [
-            (self.parent_handler_decorator, self.parent_handler)
-        ]
+
+        class Parent(events.EventsBehaviour):
+            handle_click = events.handle("click")(parent_handler)
+            parent = None
 
         class Context(events.EventsBehaviour):
             handle_resize = events.handle("resize")(resize_handler)
             handle_click = events.handle("click", priority=1)(click_handler)
-            parent = self.parent
 
+        self.parent = Parent()
         self.context = Context()
+        self.context.parent = MagicMock()
+        self.context.parent.parent = self.parent
 
     def test_event_handlers(self):
         handlers = list(self.context.event_handlers)
-        handler_name_matches = [d.name for d, h in handlers]
+        handler_name_matches = [d.event_names for d, h in handlers]
         handler_results = [h() for d, h in handlers]
-        self.assertEqual(handler_name_matches, ["click", "resize", "click"])
+        self.assertEqual(handler_name_matches, [("click",), ("resize",), ("click",)])
         self.assertEqual(
             handler_results, ["from click", "from resize", "from parent click"]
         )
+        self.click_handler.assert_called_with(self.context)
+        self.parent_handler.assert_called_with(self.parent)
 
     @patch("contextplus.behaviour.events.Event")
     def test_emit_handled(self, Event):
         expected_event = Event.return_value
-        decorated = MagicMock()
-        decorated.match.return_value = True
-        bound_handler = MagicMock()
-        self.context._event_handlers = [(decorated, bound_handler)]
         self.context.emit("click", {"foo": "blah"})
-        Event.assert_called_with(self.context, "click", {"foo": "blah"})
-        decorated.match.assert_called_with(expected_event)
-        bound_handler.assert_called_with(expected_event)
+        Event.assert_called_once_with(self.context, "click", {"foo": "blah"})
+        self.click_handler.assert_called_with(self.context, expected_event)
+        self.parent_handler.assert_called_with(self.parent, expected_event)
+        self.resize_handler.assert_not_called()
 
     @patch("contextplus.behaviour.events.Event")
     def test_emit_not_handled(self, Event):
-        decorated = MagicMock()
-        decorated.match.return_value = False
-        bound_handler = MagicMock()
-        self.context._event_handlers = [(decorated, bound_handler)]
+        self.context.emit("scroll")
+        Event.assert_not_called()
+        self.click_handler.assert_not_called()
+        self.resize_handler.assert_not_called()
+        self.parent_handler.assert_not_called()
+
+    def test_handler_chain_shared(self):
+        other = type(self.context)()
+        other.parent = self.parent
+        self.context.parent = self.parent
+        chain = self.context.handler_chain
+        self.assertIs(other.handler_chain, chain)
+        self.assertIs(chain.parent, self.parent.handler_chain)
+        self.assertNotIn("_event_handlers", vars(self.context))
+
+    def test_handler_chain_parent_changed(self):
+        chain = self.context.handler_chain
+        self.context.parent = None
+        self.assertIsNot(self.context.handler_chain, chain)
+        self.assertIsNone(self.context.handler_chain.parent)
         self.context.emit("click")
-        bound_handler.assert_not_called()
+        self.parent_handler.assert_not_called()
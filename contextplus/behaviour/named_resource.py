@@ -11,12 +11,22 @@ class Foo(DomainBase):
 """
 
 
+def _acquire_get(inst, name):
+    """Return an acquired attribute of inst, or None if it can not be acquired"""
+    try:
+        acquire_get = inst.acquire_get
+    except AttributeError:
+        return None
+    return acquire_get(name)
+
+
 class NamedResourceFactoryDecorator(object):
-    def __init__(self, name, factory, no_cache):
+    def __init__(self, name, factory, no_cache=False, ttl=None):
         """Initialize decorator"""
         self.name = name
         self.factory = factory
         self.no_cache = no_cache
+        self.ttl = ttl
 
     def __get__(self, inst, owner):
         """Some serious depp python stuff going on here....
@@ -39,15 +49,7 @@ class NamedResourceFactoryDecorator(object):
             return self
 
         # return a wrapped factory method for an attribute on an instance object
-        def method():
-            try:
-                resource_path_names = inst.path_names + (self.name,)
-                cached_resource = inst.acquire.resource_cache_get(resource_path_names)
-            except AttributeError:
-                cached_resource = None
-            if cached_resource is not None:
-                return cached_resource
-
+        def create():
             # Create new resource object
             new_resource = self.factory(inst)
 
@@ -64,24 +66,53 @@ class NamedResourceFactoryDecorator(object):
                     new_resource.set_name(self.name)
                 else:
                     new_resource.__name__ = self.name
+            return new_resource
 
+        def method():
             if not self.no_cache:
-                try:
-                    inst.acquire.resource_cache_set(resource_path_names, new_resource)
-                except AttributeError:
-                    pass
-            return new_resource
+                get_or_create = _acquire_get(inst, "resource_cache_get_or_create")
+                if get_or_create is not None:
+                    return get_or_create(
+                        inst.path_names + (self.name,), create, self.ttl
+                    )
+            return create()
 
         return method
 
 
-def resource(name, no_cache=False):
+def resource(name, no_cache=False, ttl=None):
     def config_factory(factory):
-        return NamedResourceFactoryDecorator(name=name, factory=factory, no_cache=no_cache)
+        return NamedResourceFactoryDecorator(
+            name=name, factory=factory, no_cache=no_cache, ttl=ttl
+        )
 
     return config_factory
 
 
+def get_named_resource_factories(cls):
+    """Return a mapping of resource name to NamedResourceFactoryDecorator for a class
+
+    The mapping is built once per class by walking the method resolution order
+    from the most derived class, and is then stored on the class itself. An
+    attribute overridden in a subclass is ignored, and when two attributes
+    declare the same resource name the one in the most derived class wins.
+    """
+    factories = cls.__dict__.get("_named_resource_factories")
+    if factories is not None:
+        return factories
+    factories = {}
+    seen = set()
+    for klass in cls.__mro__:
+        for cls_name, cls_item in vars(klass).items():
+            if cls_name in seen:
+                continue
+            seen.add(cls_name)
+            if isinstance(cls_item, NamedResourceFactoryDecorator):
+                factories.setdefault(cls_item.name, cls_item)
+    cls._named_resource_factories = factories
+    return factories
+
+
 class NamedResourceBehaviour(object):
     """THe behaviour class which add the ability to traverse named resources"""
 
@@ -116,23 +147,18 @@ class NamedResourceBehaviour(object):
             None: If no tinterface is found
         """
         cls = type(self)
-        for cls_name in dir(cls):
-            cls_item = getattr(cls, cls_name, None)
-            if isinstance(cls_item, NamedResourceFactoryDecorator):
-                if cls_item.name == name:
-                    return getattr(self, cls_name)()
-        return default
+        factory = get_named_resource_factories(cls).get(name)
+        if factory is None:
+            return default
+        return factory.__get__(self, cls)()
 
     def iter_named_resources(self):
         """Iterate through tinterfaces"""
         cls = type(self)
-        for cls_name in dir(cls):
-            cls_item = getattr(cls, cls_name, None)
-            if isinstance(cls_item, NamedResourceFactoryDecorator):
-                factory = getattr(self, cls_name)
-                item = factory()
-                if item:
-                    yield item
+        for factory in get_named_resource_factories(cls).values():
+            item = factory.__get__(self, cls)()
+            if item:
+                yield item
 
     def __getitem__(self, key):
         """Return an item contained in this contextplus object.
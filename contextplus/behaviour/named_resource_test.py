@@ -23,33 +23,55 @@ class TestNamedResourceFactoryDecorator(TestCase):
         self.assertEqual(decorated.name, "foo")
         self.assertEqual(decorated.factory, function)
         instance = MagicMock()
-        instance.acquire = None
+        instance.acquire_get.return_value = None
         new_resource = decorated.__get__(instance, None)()
         self.assertEqual(new_resource, expected_resource)
         function.assert_called_with(instance)
         expected_resource.set_name.assert_called_with("foo")
 
-    def test_named_resource_factory_decorator_with_resource_cache_set(self):
+    def test_named_resource_factory_decorator_with_resource_cache(self):
         function = MagicMock()
         expected_resource = function.return_value
         expected_resource.__name__ = None
         decorated = named_resource.NamedResourceFactoryDecorator("foo", function)
         instance = MagicMock()
-        instance.acquire.resource_cache_get.return_value = None
+        get_or_create = instance.acquire_get.return_value
+        get_or_create.side_effect = lambda key, create, ttl: create()
         new_resource = decorated.__get__(instance, None)()
         self.assertEqual(new_resource, expected_resource)
         function.assert_called_with(instance)
-        instance.acquire.resource_cache_set.assert_called_with(
-            instance.path_names + ("foo",), new_resource
+        instance.acquire_get.assert_called_with("resource_cache_get_or_create")
+        get_or_create.assert_called_once()
+        self.assertEqual(
+            get_or_create.call_args[0][0], instance.path_names + ("foo",)
         )
 
     def test_named_resource_factory_decorator_with_resource_cache_get(self):
         function = MagicMock()
         decorated = named_resource.NamedResourceFactoryDecorator("foo", function)
         instance = MagicMock()
-        instance.acquire.resource_cache_get.return_value = "blah"
+        instance.acquire_get.return_value.return_value = "blah"
         new_resource = decorated.__get__(instance, None)()
         self.assertEqual(new_resource, "blah")
+        function.assert_not_called()
+
+    def test_named_resource_factory_decorator_ttl(self):
+        decorated = named_resource.resource("foo", ttl=30)(MagicMock())
+        self.assertEqual(decorated.ttl, 30)
+        instance = MagicMock()
+        decorated.__get__(instance, None)()
+        get_or_create = instance.acquire_get.return_value
+        self.assertEqual(get_or_create.call_args[0][2], 30)
+
+    def test_named_resource_factory_decorator_no_cache(self):
+        function = MagicMock()
+        decorated = named_resource.NamedResourceFactoryDecorator(
+            "foo", function, no_cache=True
+        )
+        instance = MagicMock()
+        new_resource = decorated.__get__(instance, None)()
+        self.assertEqual(new_resource, function.return_value)
+        instance.acquire_get.assert_not_called()
 
 
 class TestNamedResourceBehaviour(TestCase):
@@ -89,3 +111,30 @@ class TestNamedResourceBehaviour(TestCase):
         foo_and_bar.sort(key=lambda x: x.__name__)
         foo_and_bar[0].__name__ = "bar"
         foo_and_bar[1].__name__ = "foo"
+
+    def test_named_resource_factories(self):
+        factories = named_resource.get_named_resource_factories(self.Context)
+        self.assertEqual(sorted(factories), ["bar", "foo"])
+        self.assertIs(factories["foo"], self.Context.__dict__["get_foo"])
+        self.assertIs(
+            named_resource.get_named_resource_factories(self.Context), factories
+        )
+
+    def test_named_resource_factories_override(self):
+        Child = self.Child
+
+        class SubContext(self.Context):
+            get_bar = None
+
+            @named_resource.resource("foo")
+            def get_other_foo(self):
+                return Child()
+
+        factories = named_resource.get_named_resource_factories(SubContext)
+        self.assertEqual(list(factories), ["foo"])
+        self.assertIs(factories["foo"], SubContext.__dict__["get_other_foo"])
+        self.assertIsNone(SubContext().get_named_resource("bar"))
+        self.assertEqual(
+            sorted(named_resource.get_named_resource_factories(self.Context)),
+            ["bar", "foo"],
+        )
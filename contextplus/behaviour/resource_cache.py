@@ -1,32 +1,535 @@
 # -*- coding:utf-8 -*-
 
-import cachetools
+from .. import cache
+from . import events
+
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+
+
+logger = logging.getLogger("contextplus.behaviour.resource_cache")
 
 
 class ResourceCacheBehaviour(object):
 
     resource_cache_max_size = 10000
+
+    # Bound the cache by the estimated bytes of its resources instead of the
+    # number of entries, see resource_cache_sizeof
+    resource_cache_max_bytes = None
+
+    # The eviction policy, one of lru, lfu, ttl, tinylfu (scan resistant) or
+    # weak. The weak policy only keeps resources alive while they are in use
+    # elsewhere or among the resource_cache_max_size most recently used
+    resource_cache_policy = "lru"
+
+    # The default number of seconds a resource is cached for, None for no
+    # expiry. Required by the ttl policy. Resource classes can override it
+    # with a cache_ttl class attribute and named resources with @resource(ttl=)
+    resource_cache_ttl = None
+
+    # Use a sharded cache with a lock per shard and coalesce concurrent
+    # misses on the same key, for use with threaded servers
+    resource_cache_thread_safe = False
+    resource_cache_shards = 16
+
+    # Remember keys which have no resource for resource_cache_negative_ttl
+    # seconds so that repeated requests for a missing name (e.g. 404s) do
+    # not each go to the database. Only lookups which ask for it, such as
+    # collection children, are negatively cached. A max size of 0 disables it
+    resource_cache_negative_max_size = 1000
+    resource_cache_negative_ttl = 30
+
+    # A cache.CacheManager shared by many sites in a process. Each site's
+    # cache may then grow to the manager's whole budget, which is enforced
+    # across all the registered sites. Requires resource_cache_thread_safe
+    resource_cache_manager = None
+
+    # Keep hit, miss, insertion and eviction counters in resource_cache_stats,
+    # optionally broken down by the first path names of the key and by class
+    resource_cache_stats_enabled = True
+    resource_cache_stats_prefix_depth = None
+    resource_cache_stats_by_class = False
+
+    # A cache_trace.TraceRecorder to record the cache accesses to, for
+    # replaying against other cache settings with cache_trace.simulate
+    resource_cache_trace = None
+
+    # The redis pub/sub channel used to tell other processes about evictions
+    resource_cache_channel = "contextplus.resource_cache"
+
+    # Keep a second, shared tier in redis mapping path names to the type and
+    # id of record items so that a cold process can rebuild an item with a
+    # single primary key fetch, for collections which set
+    # resource_cache_redis_ids, see SQLAlchemyCollection.get_child
+    resource_cache_redis_enabled = False
+    resource_cache_redis_prefix = "contextplus.resource_cache:"
+    resource_cache_redis_ttl = 86400
+
+    resource_cache_timer = staticmethod(time.monotonic)
+
     _resource_cache = None
+    _resource_cache_flights = None
+    _resource_cache_negative = None
+    _resource_cache_init_lock = threading.Lock()
+    _resource_cache_stats = None
+    _resource_cache_origin = None
+    _resource_cache_pubsub = None
+
+    def _resource_cache_create(self):
+        policy = self.resource_cache_policy
+        if policy == "ttl" and self.resource_cache_ttl is None:
+            raise ValueError("The ttl resource cache policy needs resource_cache_ttl")
+
+        stats = self.resource_cache_stats
+        maxsize = self.resource_cache_max_bytes
+        if maxsize is None:
+            maxsize = self.resource_cache_max_size
+            getsizeof = None
+        else:
+            getsizeof = self.resource_cache_sizeof
+        manager = self.resource_cache_manager
+        if manager is not None:
+            if not self.resource_cache_thread_safe:
+                # the manager evicts from every site's cache
+                raise ValueError(
+                    "A resource_cache_manager needs resource_cache_thread_safe"
+                )
+            maxsize = manager.maxsize
+
+        def cache_factory(maxsize):
+            store = cache.create_cache(maxsize, policy, getsizeof)
+            if stats is not None:
+                store.on_evict = stats.record_eviction
+            return store
+
+        if self.resource_cache_thread_safe:
+            self._resource_cache_flights = cache.SingleFlight()
+            # a byte budget is shared by the shards so that a resource bigger
+            # than one shard's share can still be cached
+            return cache.ShardedCache(
+                maxsize=maxsize,
+                shards=self.resource_cache_shards,
+                cache_factory=cache_factory,
+                shard_maxsize=None if getsizeof is None else maxsize,
+            )
+        return cache_factory(maxsize)
+
+    def resource_cache_sizeof(self, resource) -> int:
+        """Estimate the bytes used by a resource when resource_cache_max_bytes is set
+
+        Override this to plug in a different sizer.
+        """
+        return cache.estimate_size(resource)
 
     @property
     def resource_cache(self):
         c = self._resource_cache
         if c is None:
-            c = self._resource_cache = cachetools.LRUCache(
-                maxsize=self.resource_cache_max_size
-            )
+            if self.resource_cache_thread_safe:
+                with self._resource_cache_init_lock:
+                    c = self._resource_cache
+                    if c is None:
+                        c = self._resource_cache_init()
+            else:
+                c = self._resource_cache_init()
+        return c
+
+    @property
+    def resource_cache_negative(self):
+        """The cache of keys known to have no resource, None if disabled"""
+        c = self._resource_cache_negative
+        if c is None and self.resource_cache_negative_max_size:
+            with self._resource_cache_init_lock:
+                c = self._resource_cache_negative
+                if c is None:
+                    maxsize = self.resource_cache_negative_max_size
+                    if self.resource_cache_thread_safe:
+                        c = cache.ShardedCache(
+                            maxsize=maxsize, shards=self.resource_cache_shards
+                        )
+                    else:
+                        c = cache.IndexedLRUCache(maxsize)
+                    self._resource_cache_negative = c
+        return c
+
+    def _resource_cache_init(self):
+        c = self._resource_cache = self._resource_cache_create()
+        manager = self.resource_cache_manager
+        if manager is not None:
+            manager.register(self, c)
         return c
 
+    @property
+    def resource_cache_stats(self):
+        """The CacheStats of the resource cache, or None if stats are disabled"""
+        stats = self._resource_cache_stats
+        if stats is None and self.resource_cache_stats_enabled:
+            stats = self._resource_cache_stats = cache.CacheStats(
+                prefix_depth=self.resource_cache_stats_prefix_depth,
+                by_class=self.resource_cache_stats_by_class,
+            )
+        return stats
+
     def resource_cache_get(self, key):
-        return self.resource_cache.get(key)
+        resource = self.resource_cache.get(key)
+        trace = self.resource_cache_trace
+        if trace is not None:
+            trace.record_get(key)
+        manager = self.resource_cache_manager
+        if manager is not None:
+            manager.touch(self)
+        stats = self._resource_cache_stats
+        if stats is not None:
+            if resource is None:
+                stats.record_miss(key)
+            else:
+                stats.record_hit(key, resource)
+        return resource
 
-    def resource_cache_set(self, key, resource):
-        self.resource_cache[key] = resource
+    def resource_cache_set(self, key, resource, ttl=None):
+        """Cache a resource under key
+
+        Args:
+            key (tuple): The path names of the resource
+            resource (object): The resource to cache
+            ttl (float): Seconds to cache the resource for. Defaults to the
+                cache_ttl of the resource class then to resource_cache_ttl
+        """
+        if ttl is None:
+            ttl = getattr(type(resource), "cache_ttl", None)
+            if ttl is None:
+                ttl = self.resource_cache_ttl
+        store = self.resource_cache  # creates the stats along with the cache
+        stats = self._resource_cache_stats
+        if stats is not None:
+            stats.record_insertion(key, resource)
+        trace = self.resource_cache_trace
+        if trace is not None:
+            trace.record_set(key, resource)
+        negative = self._resource_cache_negative
+        if negative is not None:
+            negative.pop(key, None)
+        try:
+            store.set(key, resource, ttl)
+        except ValueError:
+            # the resource alone is larger than the cache
+            if stats is not None:
+                stats.record_eviction(key, resource, "rejected")
+            return
+        manager = self.resource_cache_manager
+        if manager is not None:
+            manager.update(self)
 
     def resource_cache_save(self, resource):
         key = resource.path_names
         self.resource_cache_set(key, resource)
         return key
 
+    def resource_cache_get_or_create(self, key, factory, ttl=None, negative=False):
+        """Return the cached resource for key or create, cache and return it
+
+        In thread safe mode concurrent misses on the same key are coalesced so
+        that only one thread calls the factory. With negative set, when the
+        factory returns None the key is negatively cached, so the factory is
+        not called again for resource_cache_negative_ttl seconds unless the
+        key is evicted.
+
+        Args:
+            key (tuple): The path names of the resource
+            factory (callable): Called with no arguments to create the resource,
+                may return None if there is no resource
+            ttl (float): Seconds to cache a created resource for, see
+                resource_cache_set
+            negative (bool): Negatively cache the key when there is no resource
+
+        Returns:
+            The resource or None
+        """
+        resource = self.resource_cache_get(key)
+        if resource is not None:
+            return resource
+        negative = self.resource_cache_negative if negative else None
+        if negative is not None and key in negative:
+            return None
+
+        def load():
+            # re-check the store without recording a second lookup, another
+            # thread may have created the resource while we waited
+            resource = self.resource_cache.get(key)
+            if resource is None:
+                resource = factory()
+                if resource is not None:
+                    self.resource_cache_set(key, resource, ttl)
+                elif negative is not None:
+                    negative.set(key, True, self.resource_cache_negative_ttl)
+            return resource
+
+        flights = self._resource_cache_flights
+        if flights is None:
+            return load()
+        return flights.do(key, load)
+
+    def resource_cache_invalidate(self, path_names: tuple) -> int:
+        """Remove the resource at path_names and every resource below it
+
+        Negatively cached keys at or below path_names are removed as well.
+
+        Returns:
+            int: The number of cached resources removed
+        """
+        path_names = tuple(path_names)
+        negative = self._resource_cache_negative
+        if negative is not None:
+            negative.invalidate_prefix(path_names)
+        trace = self.resource_cache_trace
+        if trace is not None:
+            trace.record_evict(path_names)
+        return self.resource_cache.invalidate_prefix(path_names)
+
+    def resource_cache_evict(self, path_names: tuple, publish: bool = True) -> int:
+        """Remove a resource and everything below it from the cache
+
+        Unless publish is False the eviction is also published over
+        ``self.redis`` so that other processes drop their copies, and the
+        redis id tier entry for path_names (but not those below it) is removed.
+
+        Returns:
+            int: The number of cached resources removed from this process
+        """
+        path_names = tuple(path_names)
+        count = 0
+        if self._resource_cache is not None:
+            count = self.resource_cache_invalidate(path_names)
+        elif self._resource_cache_negative is not None:
+            self._resource_cache_negative.invalidate_prefix(path_names)
+        if publish:
+            self.resource_cache_redis_delete(path_names)
+            self._resource_cache_publish(path_names)
+        return count
+
+    def _resource_cache_redis(self):
+        if not self.resource_cache_redis_enabled:
+            return None
+        return getattr(self, "redis", None)
+
+    def resource_cache_redis_key(self, path_names: tuple) -> str:
+        """The redis key of the id tier entry for path_names"""
+        return self.resource_cache_redis_prefix + json.dumps(
+            list(path_names), separators=(",", ":")
+        )
+
+    def resource_cache_redis_get(self, path_names: tuple):
+        """Return the (type name, id) stored in the redis tier for path_names
+
+        Returns:
+            tuple: (type_name, id) or None if there is no valid entry
+        """
+        redis = self._resource_cache_redis()
+        if redis is None:
+            return None
+        try:
+            value = redis.get(self.resource_cache_redis_key(path_names))
+        except Exception:
+            logger.exception("Unable to read the resource cache redis tier")
+            return None
+        if value is None:
+            return None
+        try:
+            data = json.loads(value)
+            return data["type"], data["id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring invalid resource cache redis entry")
+            return None
+
+    def resource_cache_redis_set(self, path_names: tuple, resource) -> bool:
+        """Store the type name and id of resource in the redis tier
+
+        Only resources with a JSON serialisable ``id`` are stored.
+
+        Returns:
+            bool: True if the entry was stored
+        """
+        redis = self._resource_cache_redis()
+        if redis is None:
+            return False
+        resource_type = type(resource)
+        try:
+            value = json.dumps(
+                {
+                    "type": f"{resource_type.__module__}.{resource_type.__qualname__}",
+                    "id": resource.id,
+                }
+            )
+        except (AttributeError, TypeError, ValueError):
+            return False
+        try:
+            redis.set(
+                self.resource_cache_redis_key(path_names),
+                value,
+                ex=self.resource_cache_redis_ttl,
+            )
+        except Exception:
+            logger.exception("Unable to write the resource cache redis tier")
+            return False
+        return True
+
+    def resource_cache_redis_delete(self, path_names: tuple):
+        """Remove the redis tier entry for path_names"""
+        redis = self._resource_cache_redis()
+        if redis is None:
+            return
+        try:
+            redis.delete(self.resource_cache_redis_key(path_names))
+        except Exception:
+            logger.exception("Unable to delete from the resource cache redis tier")
+
+    @events.handle("after-edit", "created", "workflow-after-*")
+    def handle_resource_cache_evict(self, event):
+        """Evict cached resources affected by a change to the event target"""
+        path_names = getattr(event.target, "path_names", None)
+        if path_names is not None:
+            self.resource_cache_evict(path_names)
+
+    @property
+    def resource_cache_origin(self) -> str:
+        """A unique id of this cache, used to ignore our own published evictions"""
+        origin = self._resource_cache_origin
+        if origin is None:
+            origin = self._resource_cache_origin = uuid.uuid4().hex
+        return origin
+
+    def _resource_cache_publish(self, path_names):
+        redis = getattr(self, "redis", None)
+        if redis is None:
+            return
+        message = json.dumps(
+            {"origin": self.resource_cache_origin, "path_names": list(path_names)}
+        )
+        try:
+            redis.publish(self.resource_cache_channel, message)
+        except Exception:
+            logger.exception("Unable to publish resource cache eviction")
+
+    def resource_cache_subscribe(self):
+        """Subscribe to evictions published by other processes
+
+        This should be called when a worker starts so that no evictions are
+        missed. Returns the pubsub object or None if there is no redis.
+        """
+        pubsub = self._resource_cache_pubsub
+        if pubsub is None:
+            redis = getattr(self, "redis", None)
+            if redis is None:
+                return None
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.resource_cache_channel)
+            self._resource_cache_pubsub = pubsub
+        return pubsub
+
+    def resource_cache_poll_evictions(self, max_messages: int = 1000) -> int:
+        """Apply the evictions published by other processes since the last poll
+
+        This is cheap enough to call at the start of every request.
+
+        Returns:
+            int: The number of eviction messages applied
+        """
+        pubsub = self.resource_cache_subscribe()
+        if pubsub is None:
+            return 0
+        applied = 0
+        for i in range(max_messages):
+            message = pubsub.get_message()
+            if message is None:
+                break
+            if message.get("type") != "message":
+                continue
+            try:
+                data = json.loads(message["data"])
+                origin = data["origin"]
+                path_names = tuple(data["path_names"])
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Ignoring invalid resource cache eviction message")
+                continue
+            if origin != self.resource_cache_origin:
+                self.resource_cache_evict(path_names, publish=False)
+                applied += 1
+        return applied
+
+    def resource_cache_manifest(self) -> list:
+        """Return the path names of the cached resources, shallowest first
+
+        The manifest is JSON serialisable so it can be saved, e.g. before a
+        worker stops, and passed to resource_cache_warm when the next starts.
+        """
+        c = self._resource_cache
+        if c is None:
+            return []
+        return [list(key) for key in sorted(c.keys(), key=len)]
+
+    def resource_cache_warm(self, manifest, time_budget: float = None) -> int:
+        """Resolve the resources in a manifest so that they are cached
+
+        Paths are resolved shallowest first and grouped by parent, so each
+        parent is traversed once and its children are fetched together with
+        ``get_children`` when the parent has it (e.g. a collection). Paths
+        which are not below this object or can not be found are skipped.
+
+        Args:
+            manifest (iterable): Path names as returned by resource_cache_manifest
+            time_budget (float): Stop warming after this many seconds
+
+        Returns:
+            int: The number of resources resolved
+        """
+        deadline = None
+        if time_budget is not None:
+            deadline = self.resource_cache_timer() + time_budget
+        base = self.path_names
+        depth = len(base)
+        paths = sorted(
+            {tuple(p) for p in manifest if len(p) > depth and tuple(p[:depth]) == base},
+            key=lambda p: (len(p), p),
+        )
+        warmed = 0
+        for parent_path, group in itertools.groupby(paths, key=lambda p: p[:-1]):
+            if deadline is not None and self.resource_cache_timer() >= deadline:
+                break
+            parent_names = parent_path[depth:]
+            parent, traversed = self.traverse_path(parent_names)
+            if traversed < len(parent_names):
+                continue
+            names = [path[-1] for path in group]
+            warmed += self._resource_cache_warm_children(parent, names, deadline)
+        return warmed
+
+    def _resource_cache_warm_children(self, parent, names, deadline) -> int:
+        get_children = getattr(parent, "get_children", None)
+        if get_children is not None:
+            return sum(1 for child in get_children(names) if child is not None)
+        warmed = 0
+        for name in names:
+            if deadline is not None and self.resource_cache_timer() >= deadline:
+                break
+            try:
+                parent[name]
+            except KeyError:
+                continue
+            warmed += 1
+        return warmed
+
     def resource_cache_clear(self):
+        c = self._resource_cache
+        stats = self._resource_cache_stats
+        if c is not None and stats is not None:
+            stats.evictions["cleared"] += len(c)
         self._resource_cache = None
+        self._resource_cache_negative = None
+        manager = self.resource_cache_manager
+        if manager is not None:
+            manager.unregister(self)
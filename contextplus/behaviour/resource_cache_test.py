@@ -1,5 +1,7 @@
 # -*- coding:utf-8 -*-
 
+from .. import cache
+from .. import testing
 from . import resource_cache
 from unittest import TestCase
 from unittest.mock import MagicMock
@@ -13,9 +15,9 @@ class TestResourceCacheBehaviour(TestCase):
     def setUp(self):
         self.resource = self.Resource()
 
-    @patch("cachetools.LRUCache")
-    def test_cache(self, LRUCache):
-        cache = LRUCache.return_value
+    @patch("contextplus.cache.create_cache")
+    def test_cache(self, create_cache):
+        cache = create_cache.return_value
         self.assertEqual(self.resource.resource_cache, cache)
 
         # Check no value
@@ -25,13 +27,362 @@ class TestResourceCacheBehaviour(TestCase):
         # Check set
         obj = MagicMock()
         result = self.resource.resource_cache_save(obj)
-        cache.__setitem__.assert_called_with(obj.path_names, obj)
+        cache.set.assert_called_with(obj.path_names, obj, None)
         self.assertEqual(result, obj.path_names)
 
         # Check set with explicit key
         result = self.resource.resource_cache_set("blah", obj)
-        cache.__setitem__.assert_any_call("blah", obj)
+        cache.set.assert_any_call("blah", obj, None)
 
         # Check clear cache
         self.resource.resource_cache_clear()
         self.assertIsNone(self.resource._resource_cache)
+
+    def test_get_or_create(self):
+        factory = MagicMock(return_value="created")
+        result = self.resource.resource_cache_get_or_create(("a",), factory)
+        self.assertEqual(result, "created")
+        result = self.resource.resource_cache_get_or_create(("a",), factory)
+        self.assertEqual(result, "created")
+        factory.assert_called_once_with()
+
+        factory = MagicMock(return_value=None)
+        self.assertIsNone(self.resource.resource_cache_get_or_create(("b",), factory))
+        self.assertNotIn(("b",), self.resource.resource_cache)
+
+    def test_negative(self):
+        now = 0
+        factory = MagicMock(return_value=None)
+        self.resource.resource_cache_negative_ttl = 30
+        self.resource.resource_cache_negative.timer = lambda: now
+        for i in range(3):
+            self.assertIsNone(
+                self.resource.resource_cache_get_or_create(
+                    ("", "a"), factory, negative=True
+                )
+            )
+        factory.assert_called_once_with()
+
+        # evicting the key or anything above it forgets the miss
+        self.resource.resource_cache_evict(("",), publish=False)
+        self.resource.resource_cache_get_or_create(("", "a"), factory, negative=True)
+        self.assertEqual(factory.call_count, 2)
+
+        # as does expiry
+        now = 30
+        self.resource.resource_cache_get_or_create(("", "a"), factory, negative=True)
+        self.assertEqual(factory.call_count, 3)
+
+        # and caching a resource for the key
+        self.resource.resource_cache_set(("", "a"), "a")
+        self.assertNotIn(("", "a"), self.resource.resource_cache_negative)
+
+    def test_negative_opt_in(self):
+        factory = MagicMock(return_value=None)
+        self.resource.resource_cache_get_or_create(("", "a"), factory)
+        self.resource.resource_cache_get_or_create(("", "a"), factory)
+        self.assertEqual(factory.call_count, 2)
+        self.assertNotIn(("", "a"), self.resource.resource_cache_negative)
+
+    def test_negative_disabled(self):
+        self.resource.resource_cache_negative_max_size = 0
+        factory = MagicMock(return_value=None)
+        self.resource.resource_cache_get_or_create(("", "a"), factory, negative=True)
+        self.resource.resource_cache_get_or_create(("", "a"), factory, negative=True)
+        self.assertEqual(factory.call_count, 2)
+        self.assertIsNone(self.resource.resource_cache_negative)
+
+    def test_ttl(self):
+        class Volatile(object):
+            cache_ttl = 5
+
+        volatile = Volatile()
+        self.resource.resource_cache_set(("", "a"), volatile)
+        self.resource.resource_cache_set(("", "b"), "static")
+        self.resource.resource_cache_set(("", "c"), "named", ttl=10)
+        store = self.resource.resource_cache
+        now = store.timer()
+        with patch.object(store, "timer", return_value=now + 6):
+            self.assertIsNone(self.resource.resource_cache_get(("", "a")))
+            self.assertEqual(self.resource.resource_cache_get(("", "b")), "static")
+            self.assertEqual(self.resource.resource_cache_get(("", "c")), "named")
+        with patch.object(store, "timer", return_value=now + 11):
+            self.assertIsNone(self.resource.resource_cache_get(("", "c")))
+
+    def test_policies(self):
+        for policy, cache_class in cache.cache_policies.items():
+            resource = self.Resource()
+            resource.resource_cache_policy = policy
+            resource.resource_cache_ttl = 60
+            self.assertIsInstance(resource.resource_cache, cache_class)
+        resource = self.Resource()
+        resource.resource_cache_policy = "ttl"
+        with self.assertRaises(ValueError):
+            resource.resource_cache
+        resource.resource_cache_policy = "foo"
+        with self.assertRaises(ValueError):
+            resource.resource_cache
+
+    def test_stats(self):
+        self.resource.resource_cache_max_size = 1
+        self.resource.resource_cache_get(("", "a"))
+        self.resource.resource_cache_set(("", "a"), "a")
+        self.resource.resource_cache_get(("", "a"))
+        self.resource.resource_cache_set(("", "b"), "b")
+        self.resource.resource_cache_clear()
+        self.assertEqual(
+            self.resource.resource_cache_stats.as_dict(),
+            {
+                "hits": 1,
+                "misses": 1,
+                "hit_ratio": 0.5,
+                "insertions": 2,
+                "evictions": {"capacity": 1, "cleared": 1},
+            },
+        )
+
+    def test_stats_first_insertion(self):
+        self.resource.resource_cache_max_bytes = 10
+        self.resource.resource_cache_sizeof = len
+        self.resource.resource_cache_set(("", "a"), "a" * 11)
+        stats = self.resource.resource_cache_stats
+        self.assertEqual(stats.insertions, 1)
+        self.assertEqual(stats.evictions, {"rejected": 1})
+
+    def test_stats_get_or_create(self):
+        factory = MagicMock(return_value="created")
+        self.resource.resource_cache_get_or_create(("", "a"), factory)
+        self.resource.resource_cache_get_or_create(("", "a"), factory)
+        stats = self.resource.resource_cache_stats
+        self.assertEqual((stats.hits, stats.misses, stats.insertions), (1, 1, 1))
+        self.assertEqual(stats.hit_ratio, 0.5)
+
+    def test_stats_disabled(self):
+        self.resource.resource_cache_stats_enabled = False
+        self.resource.resource_cache_set(("", "a"), "a")
+        self.assertEqual(self.resource.resource_cache_get(("", "a")), "a")
+        self.assertIsNone(self.resource.resource_cache_stats)
+
+    def test_max_bytes(self):
+        self.resource.resource_cache_max_bytes = 100
+        self.resource.resource_cache_sizeof = len
+        self.resource.resource_cache_set(("", "a"), "a" * 60)
+        self.resource.resource_cache_set(("", "b"), "b" * 30)
+        self.assertEqual(len(self.resource.resource_cache), 2)
+        self.resource.resource_cache_set(("", "c"), "c" * 30)
+        self.assertEqual(set(self.resource.resource_cache), {("", "b"), ("", "c")})
+        self.assertEqual(self.resource.resource_cache.currsize, 60)
+
+        # a resource larger than the whole cache is not cached
+        self.resource.resource_cache_set(("", "d"), "d" * 101)
+        self.assertNotIn(("", "d"), self.resource.resource_cache)
+        self.assertEqual(
+            self.resource.resource_cache_stats.evictions,
+            {"capacity": 1, "rejected": 1},
+        )
+
+    def test_invalidate(self):
+        for path_names in [("", "a"), ("", "a", "b"), ("", "a", "b", "c"), ("", "ab")]:
+            self.resource.resource_cache_set(path_names, "foo")
+        self.assertEqual(self.resource.resource_cache_invalidate(("", "a", "b")), 2)
+        self.assertEqual(
+            sorted(self.resource.resource_cache.keys()), [("", "a"), ("", "ab")]
+        )
+
+
+class TestResourceCacheBehaviourManager(TestCase):
+    class Resource(resource_cache.ResourceCacheBehaviour):
+        resource_cache_thread_safe = True
+        resource_cache_shards = 1
+
+    def setUp(self):
+        self.manager = cache.CacheManager(maxsize=4)
+        self.site1 = self.Resource()
+        self.site2 = self.Resource()
+        self.site1.resource_cache_manager = self.manager
+        self.site2.resource_cache_manager = self.manager
+
+    def test_shared_budget(self):
+        for i in range(4):
+            self.site1.resource_cache_set(("", str(i)), i)
+        self.assertEqual(self.site1.resource_cache.maxsize, 4)
+        self.site2.resource_cache_set(("", "0"), "other")
+        self.site2.resource_cache_set(("", "1"), "other")
+        self.assertEqual(len(self.site1.resource_cache), 2)
+        self.assertEqual(self.site2.resource_cache_get(("", "0")), "other")
+        self.assertEqual(self.site1.resource_cache_get(("", "3")), 3)
+        self.assertEqual(self.manager.currsize, 4)
+
+    def test_clear(self):
+        self.site1.resource_cache_set(("", "a"), "a")
+        self.assertEqual(len(self.manager), 1)
+        self.site1.resource_cache_clear()
+        self.assertEqual(len(self.manager), 0)
+        self.assertEqual(self.manager.currsize, 0)
+
+    def test_enforce_over_budget_only(self):
+        self.manager.timer = lambda: 0
+        self.manager._enforce = MagicMock(wraps=self.manager._enforce)
+        for i in range(4):
+            self.site1.resource_cache_set(("", str(i)), i)
+        self.manager._enforce.assert_not_called()
+        self.assertEqual(self.manager.currsize, 4)
+        self.site2.resource_cache_set(("", "0"), "other")
+        self.assertEqual(self.manager._enforce.call_count, 1)
+        self.assertEqual(self.manager.currsize, 4)
+
+        # later inserts evict without measuring every cache again
+        self.site2.resource_cache_set(("", "1"), "other")
+        self.site2.resource_cache_set(("", "2"), "other")
+        self.assertEqual(self.manager._enforce.call_count, 1)
+        self.assertEqual(self.manager.currsize, 4)
+        self.assertEqual(len(self.site1.resource_cache), 2)
+        self.assertEqual(len(self.site2.resource_cache), 2)
+
+    def test_requires_thread_safe(self):
+        site = resource_cache.ResourceCacheBehaviour()
+        site.resource_cache_manager = self.manager
+        with self.assertRaises(ValueError):
+            site.resource_cache
+
+
+class TestResourceCacheBehaviourThreadSafe(TestCase):
+    class Resource(resource_cache.ResourceCacheBehaviour):
+        resource_cache_thread_safe = True
+
+    def setUp(self):
+        self.resource = self.Resource()
+
+    def test_cache(self):
+        self.assertIsInstance(self.resource.resource_cache, cache.ShardedCache)
+        self.resource.resource_cache_set(("a",), "foo")
+        self.assertEqual(self.resource.resource_cache_get(("a",)), "foo")
+
+    def test_get_or_create_coalesced(self):
+        factory = MagicMock(return_value="created")
+        self.resource.resource_cache  # initialise the cache
+        flights = self.resource._resource_cache_flights
+        with patch.object(flights, "do", wraps=flights.do) as do:
+            result = self.resource.resource_cache_get_or_create(("a",), factory)
+        self.assertEqual(result, "created")
+        do.assert_called_once()
+        self.assertEqual(self.resource.resource_cache_get(("a",)), "created")
+
+    def test_invalidate(self):
+        self.resource.resource_cache_set(("", "a"), "foo")
+        self.resource.resource_cache_set(("", "a", "b"), "foo")
+        self.resource.resource_cache_set(("", "c"), "foo")
+        self.assertEqual(self.resource.resource_cache_invalidate(("", "a")), 2)
+        self.assertEqual(list(self.resource.resource_cache.keys()), [("", "c")])
+
+    def test_max_bytes_shared_by_shards(self):
+        self.resource.resource_cache_max_bytes = 16000
+        self.resource.resource_cache_sizeof = len
+        self.resource.resource_cache_set(("", "a"), "a" * 2000)
+        self.assertIn(("", "a"), self.resource.resource_cache)
+        for i in range(20):
+            self.resource.resource_cache_set(("", str(i)), "b" * 2000)
+        self.assertLessEqual(self.resource.resource_cache.currsize, 16000)
+
+
+class TestResourceCacheBehaviourEviction(TestCase):
+    class Resource(resource_cache.ResourceCacheBehaviour):
+        def __init__(self, redis=None):
+            self.redis = redis
+
+    def setUp(self):
+        self.redis = testing.FakeRedis()
+        self.worker1 = self.Resource(self.redis)
+        self.worker2 = self.Resource(self.redis)
+        self.worker2.resource_cache_subscribe()
+        for worker in [self.worker1, self.worker2]:
+            worker.resource_cache_set(("", "a"), "a")
+            worker.resource_cache_set(("", "a", "b"), "b")
+            worker.resource_cache_set(("", "c"), "c")
+
+    def test_handle_evict(self):
+        event = MagicMock()
+        event.target.path_names = ("", "a")
+        self.worker1.handle_resource_cache_evict(event)
+        self.assertEqual(list(self.worker1.resource_cache.keys()), [("", "c")])
+        self.assertEqual(len(self.worker2.resource_cache), 3)
+
+        # the other worker applies the published eviction
+        self.assertEqual(self.worker2.resource_cache_poll_evictions(), 1)
+        self.assertEqual(list(self.worker2.resource_cache.keys()), [("", "c")])
+        self.assertEqual(self.worker2.resource_cache_poll_evictions(), 0)
+
+    def test_own_evictions_ignored(self):
+        self.worker2.resource_cache_evict(("", "c"))
+        self.assertEqual(self.worker2.resource_cache_poll_evictions(), 0)
+
+    def test_invalid_message(self):
+        self.redis.publish(self.worker2.resource_cache_channel, "not json")
+        self.assertEqual(self.worker2.resource_cache_poll_evictions(), 0)
+
+    def test_no_redis(self):
+        worker = self.Resource()
+        worker.resource_cache_set(("", "a"), "a")
+        self.assertEqual(worker.resource_cache_evict(("", "a")), 1)
+        self.assertEqual(worker.resource_cache_poll_evictions(), 0)
+
+
+class TestResourceCacheBehaviourRedisTier(TestCase):
+    class Resource(resource_cache.ResourceCacheBehaviour):
+        resource_cache_redis_enabled = True
+
+    class Item(object):
+        id = {"item_id": 1}
+
+    def setUp(self):
+        self.resource = self.Resource()
+        self.resource.redis = testing.FakeRedis()
+
+    def test_set_get(self):
+        item = self.Item()
+        self.assertTrue(self.resource.resource_cache_redis_set(("", "a"), item))
+        self.assertEqual(
+            self.resource.resource_cache_redis_get(("", "a")),
+            (f"{__name__}.TestResourceCacheBehaviourRedisTier.Item", {"item_id": 1}),
+        )
+        self.assertIsNone(self.resource.resource_cache_redis_get(("", "b")))
+
+    def test_shared(self):
+        other = self.Resource()
+        other.redis = self.resource.redis
+        self.resource.resource_cache_redis_set(("", "a"), self.Item())
+        self.assertIsNotNone(other.resource_cache_redis_get(("", "a")))
+
+    def test_evict(self):
+        self.resource.resource_cache_redis_set(("", "a"), self.Item())
+        self.resource.resource_cache_evict(("", "a"), publish=False)
+        self.assertIsNotNone(self.resource.resource_cache_redis_get(("", "a")))
+        self.resource.resource_cache_evict(("", "a"))
+        self.assertIsNone(self.resource.resource_cache_redis_get(("", "a")))
+
+    def test_not_storable(self):
+        self.assertFalse(self.resource.resource_cache_redis_set(("", "a"), object()))
+        item = self.Item()
+        item.id = object()
+        self.assertFalse(self.resource.resource_cache_redis_set(("", "a"), item))
+
+    def test_invalid_entry(self):
+        self.resource.redis.set(self.resource.resource_cache_redis_key(("a",)), "x")
+        self.assertIsNone(self.resource.resource_cache_redis_get(("a",)))
+
+    def test_disabled(self):
+        self.resource.resource_cache_redis_enabled = False
+        self.assertFalse(self.resource.resource_cache_redis_set(("a",), self.Item()))
+        self.assertIsNone(self.resource.resource_cache_redis_get(("a",)))
+        self.assertEqual(self.resource.redis.data, {})
+
+    def test_redis_error(self):
+        self.resource.redis = MagicMock()
+        self.resource.redis.get.side_effect = ConnectionError()
+        self.resource.redis.set.side_effect = ConnectionError()
+        with self.assertLogs(resource_cache.logger, "ERROR"):
+            self.assertIsNone(self.resource.resource_cache_redis_get(("a",)))
+        with self.assertLogs(resource_cache.logger, "ERROR"):
+            self.assertFalse(
+                self.resource.resource_cache_redis_set(("a",), self.Item())
+            )
@@ -2,10 +2,92 @@
 
 from .. import exc
 
+import sys
+
+
+_generation = 0
+
+_interned_path_names = {}
+_interned_path_names_max_size = 100000
+
+
+def invalidate_traversal():
+    """Make every cached ancestry result check that its ancestry is unchanged
+
+    This is called when the parent or name of an object changes after its
+    ancestors or path names have been looked at. Only the results below that
+    object are recomputed. Call it after changing the parent or name of an
+    ancestor which is not a TraversalBehaviour, since those can not be checked.
+    """
+    global _generation
+    _generation += 1
+
+
+def traversal_generation():
+    """Return a number which changes whenever cached ancestry results may be stale"""
+    return _generation
+
+
+def traversal_token(obj):
+    """Return a value which changes when the ancestry of obj changes
+
+    For a TraversalBehaviour whose parent is one too (or None) this is its
+    cached ancestry, which only changes when the names or parents of obj or
+    its ancestors change. Otherwise it is the traversal generation.
+    """
+    if isinstance(obj, TraversalBehaviour):
+        parent = obj.parent
+        if parent is None or isinstance(parent, TraversalBehaviour):
+            return obj._get_traversal_cache()
+    return _generation
+
+
+def intern_path_names(path_names: tuple) -> tuple:
+    """Return a shared tuple equal to path_names
+
+    Interned tuples compare by identity first, which makes them cheap to use
+    as cache keys. The intern table is dropped when it grows too big.
+    """
+    interned = _interned_path_names.get(path_names)
+    if interned is not None:
+        return interned
+    if len(_interned_path_names) >= _interned_path_names_max_size:
+        _interned_path_names.clear()
+    _interned_path_names[path_names] = path_names
+    return path_names
+
 
 class TraversalBehaviour(object):
 
-    parent = None
+    _parent = None
+    _name = None
+
+    # Set when values derived from the ancestry of this object have been cached
+    _traversal_observed = False
+    _traversal_cache = None
+    _traversal_checked = None
+
+    @property
+    def parent(self):
+        """The parent object"""
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        if self._traversal_observed and parent is not self._parent:
+            invalidate_traversal()
+        self._parent = parent
+
+    @property
+    def name(self):
+        """The traversal name of this object"""
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        if self._traversal_observed and name != self._name:
+            invalidate_traversal()
+        self._name = name
 
     def __getitem__(self, key):
         """Return an items contained in this domain object.
@@ -22,25 +104,87 @@ class TraversalBehaviour(object):
         except KeyError:
             return default
 
+    def _get_traversal_cache(self):
+        """Return the tuple (parent cache, ancestors, path_names) for this object
+
+        The tuple is computed once and reused from the parent's own cache. When
+        the ancestry of some observed object changed it is checked against the
+        parent's cache and the name of this object, so it is only recomputed if
+        this object is below the change.
+        """
+        cache = self._traversal_cache
+        if cache is not None:
+            if self._traversal_checked == _generation:
+                return cache
+            if self._traversal_unchanged(cache):
+                self._traversal_checked = _generation
+                return cache
+
+        name = self.name or ""
+        if isinstance(name, str):
+            name = sys.intern(name)
+        parent = self.parent
+        parent_cache = None
+        if parent is None:
+            ancestors = ()
+            path_names = (name,)
+        elif isinstance(parent, TraversalBehaviour):
+            parent_cache = parent._get_traversal_cache()
+            ancestors = (parent,) + parent_cache[1]
+            path_names = parent_cache[2] + (name,)
+        else:
+            # ancestors which are not traversal behaviours can not be checked
+            ancestors = []
+            current = parent
+            while current is not None:
+                ancestors.append(current)
+                current = current.parent
+            ancestors = tuple(ancestors)
+            path_names = [a.name or "" for a in reversed(ancestors)]
+            path_names = (*path_names, name)
+
+        cache = (parent_cache, ancestors, intern_path_names(path_names))
+        self._traversal_cache = cache
+        self._traversal_checked = _generation
+        self._traversal_observed = True
+        return cache
+
+    def _traversal_unchanged(self, cache) -> bool:
+        """Return whether the ancestry cached in cache is still current"""
+        parent = self.parent
+        ancestors = cache[1]
+        if parent is None:
+            unchanged = not ancestors
+        elif not ancestors or ancestors[0] is not parent:
+            unchanged = False
+        elif isinstance(parent, TraversalBehaviour):
+            unchanged = parent._get_traversal_cache() is cache[0]
+        else:
+            unchanged = False
+        return unchanged and (self.name or "") == cache[2][-1]
+
+    @property
+    def ancestors(self) -> tuple:
+        """Return a tuple of the ancestors, nearest first"""
+        return self._get_traversal_cache()[1]
+
+    @property
+    def depth(self) -> int:
+        """Return the number of ancestors"""
+        return len(self._get_traversal_cache()[1])
+
     def iter_ancestors(self):
-        current = self.parent
-        while current is not None:
-            yield current
-            current = current.parent
+        return iter(self._get_traversal_cache()[1])
 
     @property
     def path_names(self):
         """Return a tuple of path names"""
-        items = [self.name or ""]
-        for ancestor in self.iter_ancestors():
-            items.append(ancestor.name or "")
-        items.reverse()
-        return tuple(items)
+        return self._get_traversal_cache()[2]
 
     @property
     def root(self):
         """Return the root object"""
-        highest = self
-        for ancestor in self.iter_ancestors():
-            highest = ancestor
-        return highest
+        ancestors = self._get_traversal_cache()[1]
+        if ancestors:
+            return ancestors[-1]
+        return self
@@ -37,3 +37,58 @@ class TestTraversal(TestCase):
     def test_root(self):
         result = self.leaf.root
         self.assertEqual(result, self.root)
+
+    def test_ancestors(self):
+        self.assertEqual(self.leaf.ancestors, (self.mid, self.root))
+        self.assertEqual(self.leaf.depth, 2)
+        self.assertEqual(self.root.depth, 0)
+
+    def test_cached(self):
+        path_names = self.leaf.path_names
+        self.assertIs(self.leaf.path_names, path_names)
+        other = traversal.TraversalBehaviour()
+        other.name = "leaf"
+        other.parent = self.mid
+        self.assertIs(other.path_names, path_names)
+
+    def test_invalidate_name(self):
+        self.assertEqual(self.leaf.path_names, ("", "mid", "leaf"))
+        self.mid.name = "middle"
+        self.assertEqual(self.leaf.path_names, ("", "middle", "leaf"))
+
+    def test_invalidate_parent(self):
+        self.assertEqual(self.leaf.root, self.root)
+        new_root = traversal.TraversalBehaviour()
+        new_root.name = "new"
+        self.mid.parent = new_root
+        self.assertEqual(self.leaf.root, new_root)
+        self.assertEqual(self.leaf.path_names, ("new", "mid", "leaf"))
+
+    def test_unobserved_changes_keep_cache(self):
+        generation = traversal.traversal_generation()
+        child = traversal.TraversalBehaviour()
+        child.parent = self.leaf
+        child.name = "child"
+        self.assertEqual(traversal.traversal_generation(), generation)
+        self.assertEqual(child.path_names, ("", "mid", "leaf", "child"))
+
+    def test_invalidate_subtree_only(self):
+        other = traversal.TraversalBehaviour()
+        other.name = "other"
+        other.parent = self.root
+        cache = other._get_traversal_cache()
+        leaf_cache = self.leaf._get_traversal_cache()
+        self.mid.name = "middle"
+        self.assertIs(other._get_traversal_cache(), cache)
+        self.assertIsNot(self.leaf._get_traversal_cache(), leaf_cache)
+        self.assertEqual(self.leaf.path_names, ("", "middle", "leaf"))
+
+    def test_computed_name(self):
+        class Computed(traversal.TraversalBehaviour):
+            @property
+            def name(self):
+                return "computed"
+
+        child = Computed()
+        child.parent = self.mid
+        self.assertEqual(child.path_names, ("", "mid", "computed"))
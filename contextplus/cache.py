@@ -0,0 +1,1019 @@
+# -*- coding:utf-8 -*-
+"""Cache containers used by the resource cache"""
+
+import cachetools
+import collections
+import heapq
+import sys
+import threading
+import time
+import weakref
+
+
+_PRESENT = object()  # marks a trie node which is itself a key
+
+
+class PathIndex(object):
+    """A trie of path name tuples
+
+    Used to find every key under a path prefix in time proportional to the
+    size of that subtree rather than the size of the whole cache.
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, key: tuple):
+        node = self._root
+        for name in key:
+            child = node.get(name)
+            if child is None:
+                child = node[name] = {}
+            node = child
+        node[_PRESENT] = True
+
+    def discard(self, key: tuple):
+        node = self._root
+        path = []
+        for name in key:
+            child = node.get(name)
+            if child is None:
+                return
+            path.append((node, name))
+            node = child
+        node.pop(_PRESENT, None)
+
+        # prune nodes which have become empty
+        while path and not node:
+            parent, name = path.pop()
+            del parent[name]
+            node = parent
+
+    def keys_under(self, prefix: tuple) -> list:
+        """Return a list of the keys equal to or starting with prefix"""
+        prefix = tuple(prefix)
+        node = self._root
+        for name in prefix:
+            node = node.get(name)
+            if node is None:
+                return []
+        keys = []
+        stack = [(prefix, node)]
+        while stack:
+            key, node = stack.pop()
+            for name, child in node.items():
+                if name is _PRESENT:
+                    keys.append(key)
+                else:
+                    stack.append((key + (name,), child))
+        return keys
+
+    def __contains__(self, key):
+        node = self._root
+        for name in key:
+            node = node.get(name)
+            if node is None:
+                return False
+        return _PRESENT in node
+
+
+class EvictionNotifier(object):
+    """Report entries leaving a cache to an optional on_evict callback
+
+    The callback is called with (key, value, reason) where reason is one of
+    capacity, expired, invalidated or rejected (never admitted).
+    """
+
+    on_evict = None
+
+    def notify_evict(self, key, value, reason):
+        on_evict = self.on_evict
+        if on_evict is not None:
+            on_evict(key, value, reason)
+
+
+class PathIndexMixin(EvictionNotifier):
+    """Keep a PathIndex of the keys of a cachetools cache
+
+    Evictions go through ``__delitem__`` so the index always matches the keys
+    held by the cache.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path_index = PathIndex()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if cachetools.Cache.__contains__(self, key):  # the key may not be admitted
+            self.path_index.add(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.path_index.discard(key)
+
+    def clear(self):
+        super().clear()
+        self.path_index = PathIndex()
+
+    def invalidate_prefix(self, prefix: tuple) -> int:
+        """Remove every key equal to or starting with prefix
+
+        Returns:
+            int: The number of removed keys
+        """
+        keys = self.path_index.keys_under(prefix)
+        for key in keys:
+            value = cachetools.Cache.__getitem__(self, key)
+            del self[key]
+            self.notify_evict(key, value, "invalidated")
+        return len(keys)
+
+
+class ExpiryMixin(EvictionNotifier):
+    """Give cachetools cache entries an optional time to live
+
+    Entries stored with ``set(key, value, ttl)`` expire ttl seconds later.
+    Expired entries are treated as missing and are evicted before the
+    cache's own policy is asked to evict anything.
+    """
+
+    timer = staticmethod(time.monotonic)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._expires = {}
+        self._expiry_heap = []
+
+    def _expired(self, key):
+        deadline = self._expires.get(key)
+        return deadline is not None and deadline <= self.timer()
+
+    def _remove_expired(self, key):
+        value = cachetools.Cache.__getitem__(self, key)
+        del self[key]
+        self.notify_evict(key, value, "expired")
+        return value
+
+    def __getitem__(self, key):
+        if self._expired(key):
+            self._remove_expired(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        return super().__contains__(key) and not self._expired(key)
+
+    def get(self, key, default=None):
+        if self._expired(key):
+            self._remove_expired(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._expires.pop(key, None)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._expires.pop(key, None)
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, expiring after ttl seconds if ttl is not None"""
+        self[key] = value
+        if ttl is not None and super().__contains__(key):
+            deadline = self.timer() + ttl
+            self._expires[key] = deadline
+            heap = self._expiry_heap
+            heapq.heappush(heap, (deadline, id(key), key))
+            if len(heap) > 2 * len(self._expires) + 16:
+                self._compact_expiry_heap()
+            self.expire()
+
+    def _compact_expiry_heap(self):
+        """Rebuild the expiry heap from the live deadlines
+
+        Evicted, deleted and overwritten keys leave stale heap entries behind,
+        which would otherwise be kept until their deadline passed.
+        """
+        heap = [(deadline, id(key), key) for key, deadline in self._expires.items()]
+        heapq.heapify(heap)
+        self._expiry_heap = heap
+
+    def expire(self) -> list:
+        """Remove expired entries and return a list of their (key, value)"""
+        expired = []
+        heap = self._expiry_heap
+        now = self.timer()
+        while heap and heap[0][0] <= now:
+            deadline, i, key = heapq.heappop(heap)
+            if self._expires.get(key) == deadline:
+                expired.append((key, self._remove_expired(key)))
+        return expired
+
+    def popitem(self):
+        expired = self.expire()
+        if expired:
+            return expired[0]
+        key, value = super().popitem()
+        self.notify_evict(key, value, "capacity")
+        return key, value
+
+    def clear(self):
+        super().clear()
+        self._expires.clear()
+        self._expiry_heap = []
+
+
+class CountMinSketch(object):
+    """An approximate counter of key frequencies in a fixed amount of memory
+
+    Counts are halved after every ``sample_size`` increments so that the
+    sketch follows changes in popularity.
+    """
+
+    depth = 4
+    max_count = 15
+
+    def __init__(self, size: int):
+        bits = 6
+        while (1 << bits) < size:
+            bits += 1
+        width = 1 << bits
+        self._shift = 64 - bits
+        self._tables = [[0] * width for i in range(self.depth)]
+        self.sample_size = 10 * width
+        self._additions = 0
+
+    # odd 64 bit multipliers, one per table, for multiply-shift hashing
+    _multipliers = (
+        0x9E3779B97F4A7C15,
+        0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9,
+        0xD6E8FEB86659FD93,
+    )
+
+    def _indexes(self, key):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        shift = self._shift
+        return [
+            ((h * m) & 0xFFFFFFFFFFFFFFFF) >> shift for m in self._multipliers
+        ]
+
+    def add(self, key):
+        for table, index in zip(self._tables, self._indexes(key)):
+            if table[index] < self.max_count:
+                table[index] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+
+    def estimate(self, key) -> int:
+        return min(
+            table[index] for table, index in zip(self._tables, self._indexes(key))
+        )
+
+    def _reset(self):
+        self._additions //= 2
+        for table in self._tables:
+            for i, count in enumerate(table):
+                table[i] = count >> 1
+
+
+class TinyLFUCache(EvictionNotifier, cachetools.Cache):
+    """A scan resistant LRU cache with a TinyLFU admission policy
+
+    Every lookup is counted in a CountMinSketch. When the cache is full a new
+    key is only admitted if it has been asked for more often than the least
+    recently used entry it would replace, so a single pass over a large
+    collection can not flush out the frequently used entries.
+    """
+
+    # Caches sized in bytes have a far larger maxsize than they have entries
+    sketch_max_size = 1 << 16
+
+    def __init__(self, maxsize, getsizeof=None):
+        super().__init__(maxsize, getsizeof)
+        self._order = collections.OrderedDict()
+        self.sketch = CountMinSketch(min(maxsize, self.sketch_max_size))
+        self.rejections = 0
+
+    def get(self, key, default=None):
+        self.sketch.add(key)
+        return super().get(key, default)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self._order.move_to_end(key)
+        return value
+
+    def admit(self, key, value) -> bool:
+        """Test if a new key should be admitted into the cache"""
+        if self.currsize + self.getsizeof(value) <= self.maxsize or not self._order:
+            return True
+        victim = next(iter(self._order))
+        return self.sketch.estimate(key) > self.sketch.estimate(victim)
+
+    def __setitem__(self, key, value):
+        if key not in self._order and not self.admit(key, value):
+            self.rejections += 1
+            self.notify_evict(key, value, "rejected")
+            return
+        super().__setitem__(key, value)
+        if key in self._order:
+            self._order.move_to_end(key)
+        else:
+            self._order[key] = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        del self._order[key]
+
+    def popitem(self):
+        try:
+            key = next(iter(self._order))
+        except StopIteration:
+            raise KeyError("%s is empty" % type(self).__name__) from None
+        return (key, self.pop(key))
+
+    def clear(self):
+        super().clear()
+        self._order.clear()
+
+
+class IndexedLRUCache(ExpiryMixin, PathIndexMixin, cachetools.LRUCache):
+    """An LRU cache of path name keys which supports prefix invalidation"""
+
+
+class IndexedLFUCache(ExpiryMixin, PathIndexMixin, cachetools.LFUCache):
+    """An LFU cache of path name keys which supports prefix invalidation"""
+
+
+class IndexedTinyLFUCache(ExpiryMixin, PathIndexMixin, TinyLFUCache):
+    """A TinyLFU cache of path name keys which supports prefix invalidation"""
+
+
+class _StrongRing(EvictionNotifier, cachetools.LRUCache):
+    """The LRU ring of strong references kept by a WeakValueCache"""
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.notify_evict(key, value, "capacity")
+        return key, value
+
+
+class WeakValueCache(EvictionNotifier):
+    """A cache of path name keys which does not keep its values alive
+
+    Values are held by weak reference, so they stay cached only while
+    something else is using them, plus a strong reference in a small LRU ring
+    of the most recently used values which is bounded by maxsize. Values which
+    can not be weakly referenced are only held by the ring. Entries whose value
+    has been garbage collected are reported to on_evict as collected.
+
+    The ring is the only part of the cache which counts towards currsize.
+    """
+
+    timer = staticmethod(time.monotonic)
+
+    def __init__(self, maxsize, getsizeof=None):
+        self.maxsize = maxsize
+        self.recent = None
+        if maxsize:
+            self.recent = _StrongRing(maxsize, getsizeof)
+            self.recent.on_evict = self._recent_evicted
+        self.path_index = PathIndex()
+        self._refs = {}
+        self._expires = {}
+        self._dead = []
+
+        def collected(ref, selfref=weakref.ref(self)):
+            self = selfref()
+            if self is not None:
+                self._dead.append(ref)
+
+        self._collected = collected
+
+    def _purge(self):
+        """Remove the entries of values which have been garbage collected"""
+        dead = self._dead
+        while dead:
+            ref = dead.pop()
+            key = ref.key
+            if self._refs.get(key) is ref:
+                del self._refs[key]
+                self._expires.pop(key, None)
+                self.path_index.discard(key)
+                self.notify_evict(key, None, "collected")
+
+    def _recent_evicted(self, key, value, reason):
+        # a value pushed out of the ring is only evicted if it is not also
+        # weakly referenced
+        if key not in self._refs:
+            self._expires.pop(key, None)
+            self.path_index.discard(key)
+            self.notify_evict(key, value, reason)
+
+    def _peek(self, key):
+        ref = self._refs.get(key)
+        value = ref() if ref is not None else None
+        if value is None and self.recent is not None:
+            value = cachetools.Cache.get(self.recent, key)
+        return value
+
+    def _expired(self, key):
+        deadline = self._expires.get(key)
+        return deadline is not None and deadline <= self.timer()
+
+    def __getitem__(self, key):
+        self._purge()
+        if self._expired(key):
+            value = self._peek(key)
+            del self[key]
+            self.notify_evict(key, value, "expired")
+            raise KeyError(key)
+        recent = self.recent
+        ref = self._refs.get(key)
+        value = ref() if ref is not None else None
+        if value is None:
+            if recent is None:
+                raise KeyError(key)
+            return recent[key]
+        if recent is not None:
+            try:
+                recent[key]
+            except KeyError:
+                try:
+                    recent[key] = value
+                except ValueError:
+                    pass  # too large to hold strongly
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        self._purge()
+        return self._peek(key) is not None and not self._expired(key)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, expiring after ttl seconds if ttl is not None
+
+        Raises:
+            ValueError: If the value can be neither weakly referenced nor held
+                by the ring
+        """
+        self._purge()
+        try:
+            ref = weakref.KeyedRef(value, self._collected, key)
+        except TypeError:
+            ref = None
+        recent = self.recent
+        try:
+            if recent is None:
+                raise ValueError("value can not be weakly referenced")
+            recent[key] = value
+        except ValueError:
+            if recent is not None:
+                recent.pop(key, None)
+            if ref is None:
+                self._refs.pop(key, None)
+                raise
+        if ref is None:
+            self._refs.pop(key, None)
+        else:
+            self._refs[key] = ref
+        self.path_index.add(key)
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = self.timer() + ttl
+
+    def __delitem__(self, key):
+        self._purge()
+        ref = self._refs.pop(key, None)
+        value = None
+        if self.recent is not None:
+            value = self.recent.pop(key, None)
+        if ref is None and value is None:
+            raise KeyError(key)
+        self._expires.pop(key, None)
+        self.path_index.discard(key)
+
+    def pop(self, key, default=None):
+        value = self.get(key)
+        if value is None:
+            return default
+        del self[key]
+        return value
+
+    def keys(self):
+        self._purge()
+        keys = list(self._refs)
+        if self.recent is not None:
+            keys.extend(key for key in self.recent.keys() if key not in self._refs)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    @property
+    def currsize(self):
+        return 0 if self.recent is None else self.recent.currsize
+
+    def popitem(self):
+        """Drop the least recently used strong reference"""
+        if self.recent is None:
+            raise KeyError("%s is empty" % type(self).__name__)
+        return self.recent.popitem()
+
+    def clear(self):
+        self._refs.clear()
+        self._expires.clear()
+        self._dead.clear()
+        self.path_index = PathIndex()
+        if self.recent is not None:
+            self.recent.clear()
+
+    def invalidate_prefix(self, prefix: tuple) -> int:
+        """Remove every key equal to or starting with prefix
+
+        Returns:
+            int: The number of removed keys
+        """
+        self._purge()
+        keys = self.path_index.keys_under(prefix)
+        for key in keys:
+            value = self._peek(key)
+            del self[key]
+            self.notify_evict(key, value, "invalidated")
+        return len(keys)
+
+
+# Cache classes by policy name. The ttl policy is LRU where every entry is
+# given the default time to live.
+cache_policies = {
+    "lru": IndexedLRUCache,
+    "lfu": IndexedLFUCache,
+    "ttl": IndexedLRUCache,
+    "tinylfu": IndexedTinyLFUCache,
+    "weak": WeakValueCache,
+}
+
+
+def create_cache(maxsize, policy="lru", getsizeof=None):
+    """Create a cache for a policy name
+
+    Raises:
+        ValueError: If the policy is unknown
+    """
+    try:
+        cache_class = cache_policies[policy]
+    except KeyError:
+        raise ValueError(f"Unknown cache policy: {policy}") from None
+    return cache_class(maxsize, getsizeof=getsizeof)
+
+
+def estimate_size(resource) -> int:
+    """Roughly estimate the memory used by a resource in bytes
+
+    A resource class can declare its size with a ``cache_size`` attribute.
+    Otherwise the size is that of the object and its attribute values, plus
+    the loaded column values of its ``_record`` if it has one. Only one level
+    of attributes is counted, it is an estimate not a measurement.
+    """
+    size = getattr(resource, "cache_size", None)
+    if size is not None:
+        return size
+    size = sys.getsizeof(resource) + _attribute_values_size(resource)
+    record = getattr(resource, "_record", None)
+    if record is not None:
+        size += sys.getsizeof(record) + _attribute_values_size(record)
+    return size
+
+
+def _attribute_values_size(obj) -> int:
+    try:
+        attributes = vars(obj)
+    except TypeError:
+        return 0
+    return sum(
+        sys.getsizeof(value)
+        for name, value in attributes.items()
+        if name != "_record" and not name.startswith("_sa_")
+    )
+
+
+class CacheStats(object):
+    """Counters of how well a cache is working
+
+    Counts hits, misses, insertions and evictions by reason. Optionally the
+    counts are also broken down by path prefix (the first ``prefix_depth``
+    path names of the key) and by the class of the cached resource. Misses
+    have no resource so they are only broken down by prefix. Insertions count
+    every attempt to cache a resource, including ones an admission policy
+    rejects (which are also counted as rejected evictions).
+
+    Counters are plain integers and are not locked, so under heavy thread
+    contention they are approximate.
+    """
+
+    def __init__(self, prefix_depth: int = None, by_class: bool = False):
+        self.prefix_depth = prefix_depth
+        self.by_class = by_class
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.insertions = 0
+        self.evictions = collections.Counter()
+        self.prefixes = collections.defaultdict(collections.Counter)
+        self.classes = collections.defaultdict(collections.Counter)
+
+    def _breakdown(self, key, value, counter_name):
+        if self.prefix_depth is not None:
+            prefix = "/".join(key[: self.prefix_depth])
+            self.prefixes[prefix][counter_name] += 1
+        if self.by_class and value is not None:
+            cls = type(value)
+            self.classes[f"{cls.__module__}.{cls.__qualname__}"][counter_name] += 1
+
+    def record_hit(self, key, value):
+        self.hits += 1
+        if self.prefix_depth is not None or self.by_class:
+            self._breakdown(key, value, "hits")
+
+    def record_miss(self, key):
+        self.misses += 1
+        if self.prefix_depth is not None:
+            self._breakdown(key, None, "misses")
+
+    def record_insertion(self, key, value):
+        self.insertions += 1
+        if self.prefix_depth is not None or self.by_class:
+            self._breakdown(key, value, "insertions")
+
+    def record_eviction(self, key, value, reason):
+        self.evictions[reason] += 1
+        if self.prefix_depth is not None or self.by_class:
+            self._breakdown(key, value, "evictions")
+
+    @property
+    def hit_ratio(self) -> float:
+        """The ratio of hits to lookups, or None if there were no lookups"""
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return None
+        return self.hits / lookups
+
+    def as_dict(self) -> dict:
+        """Return the counters as a dictionary of plain values"""
+        data = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "insertions": self.insertions,
+            "evictions": dict(self.evictions),
+        }
+        if self.prefix_depth is not None:
+            data["prefixes"] = {k: dict(v) for k, v in self.prefixes.items()}
+        if self.by_class:
+            data["classes"] = {k: dict(v) for k, v in self.classes.items()}
+        return data
+
+
+class _Call(object):
+    """A call in progress for SingleFlight"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Coalesce concurrent calls for the same key
+
+    While a call for a key is in progress other threads asking for the same
+    key wait for it and share its result (or its exception) instead of making
+    the call themselves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        """Return function(), only calling it once for concurrent callers of key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class ShardedCache(object):
+    """A thread safe cache made of independently locked shards
+
+    Keys are spread over the shards by hash, so threads working on different
+    keys rarely contend for the same lock. By default each shard is given an
+    equal share of maxsize. A larger shard_maxsize lets a shard hold entries
+    bigger than its share, e.g. for byte budgets, and the whole cache is then
+    kept within maxsize by evicting from the fullest shards after each insert.
+    """
+
+    def __init__(
+        self, maxsize, shards=16, cache_factory=IndexedLRUCache, shard_maxsize=None
+    ):
+        """Initialize the sharded cache
+
+        Args:
+            maxsize (int): The maximum size of the whole cache
+            shards (int): The number of independently locked shards
+            cache_factory (callable): Called with a maxsize to create each shard
+            shard_maxsize (int): The maximum size of each shard, defaults to
+                an equal share of maxsize
+        """
+        self.maxsize = maxsize
+        if shard_maxsize is None:
+            shard_maxsize = max(1, -(-maxsize // shards))
+        self._shared_budget = shard_maxsize * shards > maxsize
+        self._shards = tuple(
+            (threading.RLock(), cache_factory(shard_maxsize)) for i in range(shards)
+        )
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key, default=None):
+        lock, cache = self._shard(key)
+        with lock:
+            return cache.get(key, default)
+
+    def __getitem__(self, key):
+        lock, cache = self._shard(key)
+        with lock:
+            return cache[key]
+
+    def __setitem__(self, key, value):
+        shard = self._shard(key)
+        lock, cache = shard
+        with lock:
+            cache[key] = value
+        if self._shared_budget:
+            self._shrink(shard)
+
+    def set(self, key, value, ttl=None):
+        shard = self._shard(key)
+        lock, cache = shard
+        with lock:
+            cache.set(key, value, ttl)
+        if self._shared_budget:
+            self._shrink(shard)
+
+    def _shrink(self, inserted):
+        """Evict from the fullest shards until the whole cache fits in maxsize
+
+        The entry just inserted into the shard inserted is not evicted unless
+        nothing else is left.
+        """
+        while self.currsize > self.maxsize:
+            shards = [
+                shard
+                for shard in self._shards
+                if len(shard[1]) > (1 if shard is inserted else 0)
+            ]
+            lock, cache = max(shards or [inserted], key=lambda shard: shard[1].currsize)
+            with lock:
+                try:
+                    cache.popitem()
+                except KeyError:
+                    break
+
+    def __delitem__(self, key):
+        lock, cache = self._shard(key)
+        with lock:
+            del cache[key]
+
+    def pop(self, key, default=None):
+        lock, cache = self._shard(key)
+        with lock:
+            return cache.pop(key, default)
+
+    def __contains__(self, key):
+        lock, cache = self._shard(key)
+        with lock:
+            return key in cache
+
+    def __len__(self):
+        return sum(len(cache) for lock, cache in self._shards)
+
+    def keys(self):
+        """Return a list of all the keys at the time of calling"""
+        keys = []
+        for lock, cache in self._shards:
+            with lock:
+                keys.extend(cache.keys())
+        return keys
+
+    @property
+    def currsize(self):
+        return sum(cache.currsize for lock, cache in self._shards)
+
+    def popitem(self):
+        """Remove and return an item chosen by the policy of the fullest shard"""
+        lock, cache = max(self._shards, key=lambda shard: shard[1].currsize)
+        with lock:
+            return cache.popitem()
+
+    def clear(self):
+        for lock, cache in self._shards:
+            with lock:
+                cache.clear()
+
+    def invalidate_prefix(self, prefix: tuple) -> int:
+        """Remove every key equal to or starting with prefix from all shards"""
+        count = 0
+        for lock, cache in self._shards:
+            with lock:
+                count += cache.invalidate_prefix(prefix)
+        return count
+
+
+class CacheManager(object):
+    """Keep the caches of many owners, usually sites, within one shared budget
+
+    Owners are held weakly so an owner which is no longer used drops out of
+    the budget along with its cache. Each owner keeps its own cache, so keys
+    stay separate, but when the total size of all the caches is over maxsize
+    entries are evicted from the caches furthest over their fair share.
+    Owners which have been idle for more than idle_seconds have no share, so
+    their caches are emptied first and the budget follows the active owners.
+
+    Owners report the size of their cache with update, which keeps a running
+    total. When an update takes the total over maxsize, entries are evicted
+    from the updating owner's cache if it is over its share, and otherwise
+    from the caches found over their share when the caches were last
+    measured. Every cache is only measured again, and the shares worked out,
+    every remeasure_seconds. Eviction pops items from other owners' caches,
+    so the caches must be thread safe (e.g. ShardedCache) when owners are
+    used from several threads.
+
+    Sizes are in the units of the caches' currsize, the number of entries or
+    bytes when the caches have a getsizeof.
+    """
+
+    timer = staticmethod(time.monotonic)
+
+    # Seconds between measuring every cache when the budget is exceeded
+    remeasure_seconds = 1.0
+
+    def __init__(self, maxsize: int, idle_seconds: float = 300):
+        self.maxsize = maxsize
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._caches = weakref.WeakKeyDictionary()
+        self._total = 0
+        self._share = maxsize
+        self._victims = []
+        self._measured = None
+
+    def register(self, owner, cache):
+        """Add or replace the cache of owner"""
+        size = cache.currsize
+        with self._lock:
+            old = self._caches.get(owner)
+            if old is not None:
+                self._total -= old[2]
+            self._caches[owner] = [cache, self.timer(), size]
+            self._total += size
+
+    def unregister(self, owner):
+        with self._lock:
+            entry = self._caches.pop(owner, None)
+            if entry is not None:
+                self._total -= entry[2]
+
+    def touch(self, owner):
+        """Mark owner as active"""
+        entry = self._caches.get(owner)
+        if entry is not None:
+            entry[1] = self.timer()
+
+    def update(self, owner) -> int:
+        """Mark owner as active and record the current size of its cache
+
+        The caches are brought within maxsize if the running total is over it.
+
+        Returns:
+            int: The number of evicted entries
+        """
+        entry = self._caches.get(owner)
+        if entry is None:
+            return 0
+        size = entry[0].currsize
+        with self._lock:
+            now = entry[1] = self.timer()
+            self._total += size - entry[2]
+            entry[2] = size
+            if self._total <= self.maxsize:
+                return 0
+            measured = self._measured
+            if measured is None or now - measured >= self.remeasure_seconds:
+                return self._enforce(now)
+            evicted = self._evict(entry, self._share)
+            victims = self._victims
+            while victims and self._total > self.maxsize:
+                victim, limit = victims[-1]
+                evicted += self._evict(victim, limit)
+                if victim[2] <= limit:
+                    victims.pop()
+            if self._total > self.maxsize:
+                evicted += self._enforce(now)
+            return evicted
+
+    @property
+    def currsize(self):
+        """The running total of the sizes of the caches"""
+        return self._total
+
+    def __len__(self):
+        return len(self._caches)
+
+    def enforce(self) -> int:
+        """Measure the caches and evict entries until they fit in maxsize
+
+        Returns:
+            int: The number of evicted entries
+        """
+        with self._lock:
+            return self._enforce(self.timer())
+
+    def _evict(self, entry, limit) -> int:
+        """Evict from the cache of entry until it is within limit or the total fits"""
+        cache = entry[0]
+        evicted = 0
+        while self._total > self.maxsize and entry[2] > limit:
+            try:
+                cache.popitem()
+            except KeyError:
+                size = 0
+            else:
+                size = cache.currsize
+                evicted += 1
+            freed = entry[2] - size
+            entry[2] = size
+            self._total -= freed
+            if freed <= 0:
+                break
+        return evicted
+
+    def _enforce(self, now) -> int:
+        entries = list(self._caches.values())
+        for entry in entries:
+            entry[2] = entry[0].currsize
+        self._total = sum(entry[2] for entry in entries)
+        self._measured = now
+        active_since = now - self.idle_seconds
+        active = sum(1 for entry in entries if entry[1] >= active_since)
+        share = self._share = self.maxsize / max(1, active)
+        over = []
+        for entry in entries:
+            limit = share if entry[1] >= active_since else 0
+            if entry[2] > limit:
+                over.append((entry[2] - limit, id(entry), entry, limit))
+        over.sort(reverse=True)
+        evicted = 0
+        for excess, i, entry, limit in over:
+            evicted += self._evict(entry, limit)
+        # the caches still over their share are evicted from by later updates
+        self._victims = [
+            [entry, limit] for excess, i, entry, limit in reversed(over)
+            if entry[2] > limit
+        ]
+        return evicted
@@ -0,0 +1,505 @@
+# -*- coding:utf-8 -*-
+
+from . import cache
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+import gc
+import threading
+
+
+class TestPathIndex(TestCase):
+    def test_index(self):
+        index = cache.PathIndex()
+        index.add(("", "a"))
+        index.add(("", "a", "b"))
+        index.add(("", "a", "c", "d"))
+        index.add(("", "e"))
+        self.assertIn(("", "a"), index)
+        self.assertNotIn(("", "a", "c"), index)
+        self.assertEqual(
+            sorted(index.keys_under(("", "a"))),
+            [("", "a"), ("", "a", "b"), ("", "a", "c", "d")],
+        )
+        self.assertEqual(index.keys_under(("", "x")), [])
+        index.discard(("", "a", "c", "d"))
+        index.discard(("", "x"))
+        self.assertNotIn("c", index._root[""]["a"])
+        self.assertEqual(
+            sorted(index.keys_under(())), [("", "a"), ("", "a", "b"), ("", "e")]
+        )
+
+
+class TestIndexedLRUCache(TestCase):
+    def test_eviction_updates_index(self):
+        c = cache.IndexedLRUCache(maxsize=2)
+        c[("", "a")] = 1
+        c[("", "a", "b")] = 2
+        c[("", "c")] = 3
+        self.assertNotIn(("", "a"), c.path_index)
+        self.assertEqual(c.invalidate_prefix(("", "a")), 1)
+        self.assertEqual(list(c.keys()), [("", "c")])
+        c.clear()
+        self.assertEqual(c.path_index.keys_under(()), [])
+
+
+class TestExpiry(TestCase):
+    def setUp(self):
+        self.cache = cache.IndexedLRUCache(maxsize=3)
+        self.now = 100
+        self.cache.timer = lambda: self.now
+
+    def test_expiry(self):
+        self.cache.set(("", "a"), 1, ttl=10)
+        self.cache.set(("", "b"), 2)
+        self.assertEqual(self.cache.get(("", "a")), 1)
+        self.now = 110
+        self.assertNotIn(("", "a"), self.cache)
+        self.assertIsNone(self.cache.get(("", "a")))
+        self.assertNotIn(("", "a"), self.cache.path_index)
+        self.assertEqual(self.cache.get(("", "b")), 2)
+
+    def test_expired_evicted_first(self):
+        self.cache.set(("", "a"), 1)
+        self.cache.set(("", "b"), 2, ttl=5)
+        self.cache.set(("", "c"), 3)
+        self.now = 105
+        self.cache.set(("", "d"), 4)
+        self.assertEqual(
+            sorted(self.cache.keys()), [("", "a"), ("", "c"), ("", "d")]
+        )
+
+    def test_set_without_ttl_clears_expiry(self):
+        self.cache.set(("", "a"), 1, ttl=5)
+        self.cache.set(("", "a"), 2)
+        self.now = 200
+        self.assertEqual(self.cache.get(("", "a")), 2)
+
+    def test_expiry_heap_bounded(self):
+        for i in range(1000):
+            self.cache.set(("", str(i % 50)), i, ttl=3600)
+        self.assertEqual(len(self.cache), 3)
+        self.assertLessEqual(len(self.cache._expiry_heap), 2 * 3 + 16)
+        self.now = 3700
+        self.assertEqual(len(self.cache.expire()), 3)
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestTinyLFUCache(TestCase):
+    def test_scan_resistant(self):
+        c = cache.IndexedTinyLFUCache(maxsize=10)
+        hot = [("", "hot", str(i)) for i in range(10)]
+        for i in range(5):
+            for key in hot:
+                if c.get(key) is None:
+                    c[key] = key
+        for i in range(1000):
+            for key in [("", "scan", str(i)), hot[i % 10]]:
+                if c.get(key) is None:
+                    c[key] = key
+        # the sketch is approximate so allow for an unlucky hash collision
+        self.assertGreaterEqual(len(set(hot) & set(c.keys())), 8)
+        self.assertGreater(c.rejections, 900)
+
+    def test_admit_when_not_full(self):
+        c = cache.TinyLFUCache(maxsize=2)
+        c["a"] = 1
+        c["b"] = 2
+        self.assertEqual(len(c), 2)
+        c.get("c")
+        c.get("c")
+        c["c"] = 3
+        self.assertIn("c", c)
+        self.assertNotIn("a", c)
+
+    def test_invalidate_rejected(self):
+        c = cache.IndexedTinyLFUCache(maxsize=2)
+        c.get(("", "a"))
+        c.get(("", "b"))
+        c[("", "a")] = 1
+        c[("", "b")] = 2
+        c[("", "c")] = 3
+        self.assertEqual(c.rejections, 1)
+        self.assertNotIn(("", "c"), c.path_index)
+        self.assertEqual(c.invalidate_prefix(("",)), 2)
+        self.assertEqual(len(c), 0)
+
+
+class TestWeakValueCache(TestCase):
+    class Resource(object):
+        pass
+
+    def setUp(self):
+        self.evictions = []
+        self.cache = cache.WeakValueCache(maxsize=2)
+        self.cache.on_evict = lambda key, value, reason: self.evictions.append(
+            (key, reason)
+        )
+
+    def test_not_kept_alive(self):
+        resources = [self.Resource() for i in range(4)]
+        for i, resource in enumerate(resources):
+            self.cache[("", str(i))] = resource
+        self.assertEqual(len(self.cache), 4)
+        self.assertEqual(self.cache.currsize, 2)
+        self.assertIs(self.cache[("", "0")], resources[0])
+
+        # 3 and 0 are the most recently used, only 1 and 2 can go
+        del resources
+        gc.collect()
+        self.assertEqual(sorted(self.cache.keys()), [("", "0"), ("", "3")])
+        self.assertEqual(
+            sorted(self.evictions),
+            [(("", "1"), "collected"), (("", "2"), "collected")],
+        )
+        self.assertNotIn(("", "1"), self.cache.path_index)
+
+    def test_in_use(self):
+        resource = self.Resource()
+        self.cache[("", "a")] = resource
+        for i in range(4):
+            self.cache[("", str(i))] = self.Resource()
+        self.assertIs(self.cache.get(("", "a")), resource)
+
+    def test_no_ring(self):
+        c = cache.WeakValueCache(maxsize=0)
+        resource = self.Resource()
+        c.set(("a",), resource)
+        self.assertIs(c[("a",)], resource)
+        with self.assertRaises(ValueError):
+            c[("b",)] = "not weakly referenceable"
+        del resource
+        gc.collect()
+        self.assertIsNone(c.get(("a",)))
+        self.assertEqual(len(c), 0)
+        with self.assertRaises(KeyError):
+            c.popitem()
+
+    def test_strong_only(self):
+        self.cache[("", "a")] = "a"
+        self.cache[("", "b")] = "b"
+        self.cache[("", "c")] = "c"
+        self.assertNotIn(("", "a"), self.cache)
+        self.assertEqual(self.evictions, [(("", "a"), "capacity")])
+        self.assertEqual(self.cache.popitem(), (("", "b"), "b"))
+
+    def test_ttl(self):
+        now = 0
+        self.cache.timer = lambda: now
+        resource = self.Resource()
+        self.cache.set(("", "a"), resource, ttl=10)
+        self.assertIn(("", "a"), self.cache)
+        now = 10
+        self.assertNotIn(("", "a"), self.cache)
+        self.assertIsNone(self.cache.get(("", "a")))
+        self.assertEqual(self.evictions, [(("", "a"), "expired")])
+
+    def test_invalidate_prefix(self):
+        resources = [self.Resource() for i in range(3)]
+        self.cache[("", "a")] = resources[0]
+        self.cache[("", "a", "b")] = resources[1]
+        self.cache[("", "c")] = resources[2]
+        self.assertEqual(self.cache.invalidate_prefix(("", "a")), 2)
+        self.assertEqual(self.cache.keys(), [("", "c")])
+        self.assertEqual(self.cache.pop(("", "c")), resources[2])
+        self.assertEqual(len(self.cache), 0)
+        self.cache[("", "a")] = resources[0]
+        self.cache.clear()
+        self.assertNotIn(("", "a"), self.cache)
+
+
+class TestEvictionNotifier(TestCase):
+    def test_reasons(self):
+        c = cache.IndexedLRUCache(maxsize=2)
+        c.timer = lambda: now
+        now = 0
+        evictions = []
+        c.on_evict = lambda key, value, reason: evictions.append((key, reason))
+        c.set(("a",), 1, ttl=5)
+        c[("b",)] = 2
+        c[("c",)] = 3
+        c[("d",)] = 4
+        now = 10
+        c.set(("e",), 5, ttl=1)
+        now = 20
+        c.get(("e",))
+        c.invalidate_prefix(("d",))
+        self.assertEqual(
+            evictions,
+            [
+                (("a",), "capacity"),
+                (("b",), "capacity"),
+                (("c",), "capacity"),
+                (("e",), "expired"),
+                (("d",), "invalidated"),
+            ],
+        )
+
+    def test_rejected(self):
+        c = cache.IndexedTinyLFUCache(maxsize=1)
+        evictions = []
+        c.on_evict = lambda key, value, reason: evictions.append((key, reason))
+        c.get(("a",))
+        c.get(("a",))
+        c[("a",)] = 1
+        c[("b",)] = 2
+        self.assertEqual(evictions, [(("b",), "rejected")])
+        self.assertNotIn(("b",), c.path_index)
+
+
+class TestEstimateSize(TestCase):
+    def test_hint(self):
+        class Resource(object):
+            cache_size = 123
+
+        self.assertEqual(cache.estimate_size(Resource()), 123)
+
+    def test_record(self):
+        class Record(object):
+            pass
+
+        class Resource(object):
+            _record = None
+
+        small = Resource()
+        small._record = Record()
+        small._record.body = "x"
+        large = Resource()
+        large._record = Record()
+        large._record.body = "x" * 10000
+        self.assertGreater(
+            cache.estimate_size(large), cache.estimate_size(small) + 9000
+        )
+
+    def test_builtin(self):
+        self.assertGreater(cache.estimate_size("x" * 100), 100)
+
+
+class TestCacheStats(TestCase):
+    def test_stats(self):
+        stats = cache.CacheStats()
+        self.assertIsNone(stats.hit_ratio)
+        stats.record_hit(("", "a"), 1)
+        stats.record_hit(("", "a"), 1)
+        stats.record_hit(("", "a"), 1)
+        stats.record_miss(("", "b"))
+        stats.record_insertion(("", "b"), 2)
+        stats.record_eviction(("", "b"), 2, "capacity")
+        self.assertEqual(
+            stats.as_dict(),
+            {
+                "hits": 3,
+                "misses": 1,
+                "hit_ratio": 0.75,
+                "insertions": 1,
+                "evictions": {"capacity": 1},
+            },
+        )
+        stats.reset()
+        self.assertEqual(stats.hits, 0)
+
+    def test_breakdown(self):
+        stats = cache.CacheStats(prefix_depth=2, by_class=True)
+        stats.record_hit(("", "a", "1"), 1)
+        stats.record_miss(("", "a", "2"))
+        stats.record_insertion(("", "b"), "x")
+        data = stats.as_dict()
+        self.assertEqual(
+            data["prefixes"],
+            {"/a": {"hits": 1, "misses": 1}, "/b": {"insertions": 1}},
+        )
+        self.assertEqual(
+            data["classes"],
+            {"builtins.int": {"hits": 1}, "builtins.str": {"insertions": 1}},
+        )
+
+
+class TestCreateCache(TestCase):
+    def test_create_cache(self):
+        self.assertIsInstance(cache.create_cache(10, "lfu"), cache.IndexedLFUCache)
+        with self.assertRaises(ValueError):
+            cache.create_cache(10, "foo")
+
+
+class TestSingleFlight(TestCase):
+    def test_do(self):
+        flight = cache.SingleFlight()
+        self.assertEqual(flight.do("a", lambda: 1), 1)
+        self.assertEqual(flight._calls, {})
+
+    def test_coalesce(self):
+        flight = cache.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def function():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        leader = threading.Thread(target=lambda: results.append(flight.do("a", function)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("a", function)))
+            for i in range(5)
+        ]
+        for t in followers:
+            t.start()
+        release.set()
+        for t in [leader, *followers]:
+            t.join(5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["result"] * 6)
+
+    def test_error(self):
+        flight = cache.SingleFlight()
+
+        def function():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            flight.do("a", function)
+        self.assertEqual(flight._calls, {})
+
+
+class TestShardedCache(TestCase):
+    def test_cache(self):
+        c = cache.ShardedCache(maxsize=100, shards=4)
+        c[("a",)] = 1
+        c[("b",)] = 2
+        self.assertEqual(c.get(("a",)), 1)
+        self.assertEqual(c[("b",)], 2)
+        self.assertIsNone(c.get(("c",)))
+        self.assertIn(("a",), c)
+        self.assertEqual(len(c), 2)
+        self.assertEqual(sorted(c.keys()), [("a",), ("b",)])
+        del c[("a",)]
+        self.assertEqual(c.pop(("b",)), 2)
+        self.assertEqual(len(c), 0)
+        c[("a",)] = 1
+        c.clear()
+        self.assertEqual(len(c), 0)
+
+    def test_popitem(self):
+        c = cache.ShardedCache(maxsize=100, shards=4)
+        c[("a",)] = 1
+        c[("b",)] = 2
+        self.assertEqual(c.currsize, 2)
+        self.assertIn(c.popitem(), [(("a",), 1), (("b",), 2)])
+        self.assertEqual(c.currsize, 1)
+
+    def test_maxsize(self):
+        c = cache.ShardedCache(maxsize=8, shards=4)
+        for i in range(100):
+            c[(str(i),)] = i
+        self.assertLessEqual(len(c), 8)
+
+    def test_shared_budget(self):
+        def factory(maxsize):
+            return cache.create_cache(maxsize, "lru", len)
+
+        c = cache.ShardedCache(
+            maxsize=100, shards=4, cache_factory=factory, shard_maxsize=100
+        )
+        for i in range(10):
+            c[(str(i),)] = "x" * 40
+        self.assertLessEqual(c.currsize, 100)
+        self.assertEqual(len(c), 2)
+        self.assertIn(("9",), c)
+
+
+class TestCacheManager(TestCase):
+    class Owner(object):
+        pass
+
+    def setUp(self):
+        self.now = 0
+        self.manager = cache.CacheManager(maxsize=10, idle_seconds=60)
+        self.manager.timer = lambda: self.now
+
+    def fill(self, c, count, prefix):
+        for i in range(count):
+            c[(prefix, str(i))] = i
+
+    def test_fair_share(self):
+        a, b = self.Owner(), self.Owner()
+        cache_a = cache.IndexedLRUCache(maxsize=10)
+        cache_b = cache.IndexedLRUCache(maxsize=10)
+        self.manager.register(a, cache_a)
+        self.manager.register(b, cache_b)
+        self.fill(cache_a, 9, "a")
+        self.assertEqual(self.manager.enforce(), 0)
+        self.fill(cache_b, 4, "b")
+        self.assertEqual(self.manager.enforce(), 3)
+        self.assertEqual(len(cache_a), 6)
+        self.assertEqual(len(cache_b), 4)
+        self.assertEqual(self.manager.currsize, 10)
+
+        # the least recently used entries are evicted
+        self.assertNotIn(("a", "0"), cache_a)
+        self.assertIn(("a", "8"), cache_a)
+
+    def test_idle(self):
+        a, b = self.Owner(), self.Owner()
+        cache_a = cache.IndexedLRUCache(maxsize=10)
+        cache_b = cache.IndexedLRUCache(maxsize=10)
+        self.manager.register(a, cache_a)
+        self.fill(cache_a, 4, "a")
+        self.now = 100
+        self.manager.register(b, cache_b)
+        self.fill(cache_b, 9, "b")
+        self.manager.enforce()
+        self.assertEqual(len(cache_a), 1)
+        self.assertEqual(len(cache_b), 9)
+
+        self.manager.touch(a)
+        self.fill(cache_a, 4, "a")
+        self.manager.enforce()
+        self.assertEqual(len(cache_a), 4)
+        self.assertEqual(len(cache_b), 6)
+
+    def test_update(self):
+        a, b = self.Owner(), self.Owner()
+        cache_a = cache.IndexedLRUCache(maxsize=10)
+        cache_b = cache.IndexedLRUCache(maxsize=10)
+        self.manager.register(a, cache_a)
+        self.manager.register(b, cache_b)
+        self.fill(cache_a, 6, "a")
+        self.assertEqual(self.manager.update(a), 0)
+        self.assertEqual(self.manager.currsize, 6)
+        self.fill(cache_b, 6, "b")
+        self.assertEqual(self.manager.update(b), 2)
+        self.assertEqual(self.manager.currsize, 10)
+        self.assertEqual((len(cache_a), len(cache_b)), (5, 5))
+        self.manager.unregister(a)
+        self.assertEqual(self.manager.currsize, 5)
+
+    def test_update_evicts_own_cache(self):
+        owners = [self.Owner() for i in range(3)]
+        caches = [cache.IndexedLRUCache(maxsize=100) for owner in owners]
+        for owner, c in zip(owners, caches):
+            self.manager.register(owner, c)
+        self.fill(caches[0], 9, "a")
+        self.assertEqual(self.manager.update(owners[0]), 0)
+        self.fill(caches[1], 2, "b")
+        self.assertEqual(self.manager.update(owners[1]), 1)
+        self.assertEqual(len(caches[0]), 8)
+
+        # an owner over its share evicts from its own cache
+        caches[2].popitem = MagicMock(side_effect=AssertionError)
+        self.fill(caches[0], 12, "c")
+        self.assertEqual(self.manager.update(owners[0]), 12)
+        self.assertEqual(len(caches[0]), 8)
+        self.assertEqual(self.manager.currsize, 10)
+
+    def test_weak(self):
+        a = self.Owner()
+        self.manager.register(a, cache.IndexedLRUCache(maxsize=10))
+        self.assertEqual(len(self.manager), 1)
+        del a
+        self.assertEqual(len(self.manager), 0)
+        self.manager.unregister(self.Owner())
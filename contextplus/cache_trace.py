@@ -0,0 +1,142 @@
+# -*- coding:utf-8 -*-
+"""Record resource cache accesses and replay them against other cache settings
+
+A TraceRecorder set as ``resource_cache_trace`` on a site records every
+lookup, insertion and eviction of its resource cache. The saved trace can be
+replayed offline by ``simulate`` to compare hit ratios for different cache
+sizes and policies, without running any resource factories::
+
+    python -m contextplus.cache_trace trace.jsonl --sizes 1000 5000 10000
+"""
+
+from . import cache
+
+import argparse
+import collections
+import json
+import sys
+
+
+class TraceRecorder(object):
+    """A bounded in memory trace of resource cache accesses
+
+    Each event is a tuple of (operation, path names, size) where operation is
+    get, set or evict. Sizes are only recorded for sets, and only measured
+    with ``getsizeof`` if one is given, otherwise they are 1.
+    """
+
+    def __init__(self, maxlen: int = 1000000, getsizeof=None):
+        self.events = collections.deque(maxlen=maxlen)
+        self.getsizeof = getsizeof
+
+    def record_get(self, key):
+        self.events.append(("get", key, None))
+
+    def record_set(self, key, resource):
+        getsizeof = self.getsizeof
+        size = 1 if getsizeof is None else getsizeof(resource)
+        self.events.append(("set", key, size))
+
+    def record_evict(self, prefix):
+        self.events.append(("evict", prefix, None))
+
+    def __len__(self):
+        return len(self.events)
+
+    def dump(self, stream):
+        """Write the trace to a text stream as JSON lines"""
+        for operation, key, size in self.events:
+            stream.write(json.dumps([operation, list(key), size]) + "\n")
+
+
+def load_trace(stream) -> list:
+    """Read a trace written by TraceRecorder.dump"""
+    events = []
+    for line in stream:
+        line = line.strip()
+        if line:
+            operation, key, size = json.loads(line)
+            events.append((operation, tuple(key), size))
+    return events
+
+
+def replay(events, maxsize: int, policy: str = "lru", by_size: bool = False):
+    """Replay a trace against one cache and return its CacheStats
+
+    A miss on a key which the trace has shown to exist is treated as if the
+    resource factory ran, so the key is inserted just as it would have been
+    in production.
+
+    Args:
+        events (iterable): The (operation, path names, size) events
+        maxsize (int): The cache size to simulate
+        policy (str): The cache policy to simulate
+        by_size (bool): Bound the cache by the recorded sizes rather than
+            the number of entries
+    """
+    getsizeof = (lambda size: size) if by_size else None
+    store = cache.create_cache(maxsize, policy, getsizeof)
+    stats = cache.CacheStats()
+    store.on_evict = stats.record_eviction
+    sizes = {}
+
+    def insert(key, size):
+        stats.record_insertion(key, size)
+        try:
+            store[key] = size
+        except ValueError:
+            stats.record_eviction(key, size, "rejected")
+
+    for operation, key, size in events:
+        if operation == "get":
+            if store.get(key) is not None:
+                stats.record_hit(key, None)
+            else:
+                stats.record_miss(key)
+                size = sizes.get(key)
+                if size is not None:
+                    insert(key, size)
+        elif operation == "set":
+            sizes[key] = size
+            if key not in store:
+                insert(key, size)
+        elif operation == "evict":
+            store.invalidate_prefix(key)
+    return stats
+
+
+def simulate(events, sizes, policies=("lru",), by_size: bool = False) -> dict:
+    """Return the hit ratio curve of each policy over the given cache sizes
+
+    Returns:
+        dict: {policy: [(size, hit ratio), ...]}
+    """
+    events = list(events)
+    return {
+        policy: [
+            (size, replay(events, size, policy, by_size).hit_ratio) for size in sizes
+        ]
+        for policy in policies
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("trace", help="A trace file written by TraceRecorder.dump")
+    parser.add_argument("--sizes", type=int, nargs="+", required=True)
+    parser.add_argument("--policies", nargs="+", default=["lru", "lfu", "tinylfu"])
+    parser.add_argument(
+        "--by-size", action="store_true", help="Sizes are bytes, not entries"
+    )
+    args = parser.parse_args(argv)
+    with open(args.trace) as stream:
+        events = load_trace(stream)
+    curves = simulate(events, args.sizes, args.policies, args.by_size)
+    for policy, curve in curves.items():
+        for size, hit_ratio in curve:
+            ratio = "-" if hit_ratio is None else f"{hit_ratio:.4f}"
+            sys.stdout.write(f"{policy}\t{size}\t{ratio}\n")
+
+
+if __name__ == "__main__":
+    main()
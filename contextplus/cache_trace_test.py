@@ -0,0 +1,97 @@
+# -*- coding:utf-8 -*-
+
+from . import cache_trace
+from .behaviour import resource_cache
+from unittest import TestCase
+from unittest.mock import patch
+
+import io
+
+
+class TestTraceRecorder(TestCase):
+    class Resource(resource_cache.ResourceCacheBehaviour):
+        pass
+
+    def test_record(self):
+        resource = self.Resource()
+        resource.resource_cache_trace = cache_trace.TraceRecorder(getsizeof=len)
+        resource.resource_cache_get_or_create(("", "a"), lambda: "aaa")
+        resource.resource_cache_get(("", "a"))
+        resource.resource_cache_invalidate(("",))
+        self.assertEqual(
+            list(resource.resource_cache_trace.events),
+            [
+                ("get", ("", "a"), None),
+                ("set", ("", "a"), 3),
+                ("get", ("", "a"), None),
+                ("evict", ("",), None),
+            ],
+        )
+
+    def test_replay_matches_production(self):
+        resource = self.Resource()
+        resource.resource_cache_max_size = 3
+        resource.resource_cache_trace = cache_trace.TraceRecorder()
+        for i in range(5):
+            for name in "aabcd":
+                resource.resource_cache_get_or_create(("", name), lambda: name)
+        production = resource.resource_cache_stats
+        replayed = cache_trace.replay(resource.resource_cache_trace.events, 3)
+        self.assertEqual(
+            (replayed.hits, replayed.misses), (production.hits, production.misses)
+        )
+        self.assertEqual((replayed.hits, replayed.misses), (5, 20))
+
+    def test_dump_load(self):
+        recorder = cache_trace.TraceRecorder(maxlen=2)
+        recorder.record_get(("", "a"))
+        recorder.record_set(("", "a"), object())
+        recorder.record_evict(("",))
+        self.assertEqual(len(recorder), 2)
+        stream = io.StringIO()
+        recorder.dump(stream)
+        stream.seek(0)
+        self.assertEqual(
+            cache_trace.load_trace(stream),
+            [("set", ("", "a"), 1), ("evict", ("",), None)],
+        )
+
+
+class TestSimulate(TestCase):
+    def setUp(self):
+        # a loop over 4 keys which an LRU cache of 3 keeps missing
+        self.events = []
+        for i in range(10):
+            for name in "abcd":
+                key = ("", name)
+                self.events.append(("get", key, None))
+                if i == 0:
+                    self.events.append(("set", key, 10))
+
+    def test_replay(self):
+        stats = cache_trace.replay(self.events, 4)
+        self.assertEqual((stats.hits, stats.misses), (36, 4))
+        stats = cache_trace.replay(self.events, 3)
+        self.assertEqual((stats.hits, stats.misses), (0, 40))
+        stats = cache_trace.replay(self.events, 40, by_size=True)
+        self.assertEqual(stats.hits, 36)
+
+    def test_evict(self):
+        events = self.events[:8] + [("evict", ("",), None)] + self.events[8:]
+        stats = cache_trace.replay(events, 4)
+        self.assertEqual((stats.hits, stats.misses), (32, 8))
+
+    def test_simulate(self):
+        curves = cache_trace.simulate(self.events, [3, 4], ["lru", "lfu"])
+        self.assertEqual(curves["lru"], [(3, 0.0), (4, 0.9)])
+        self.assertGreater(curves["lfu"][0][1], 0)
+
+    def test_main(self):
+        recorder = cache_trace.TraceRecorder()
+        recorder.events.extend(self.events)
+        stream = io.StringIO()
+        recorder.dump(stream)
+        with patch("builtins.open", return_value=io.StringIO(stream.getvalue())):
+            with patch("sys.stdout", new_callable=io.StringIO) as stdout:
+                cache_trace.main(["trace.jsonl", "--sizes", "4", "--policies", "lru"])
+        self.assertEqual(stdout.getvalue(), "lru\t4\t0.9000\n")
@@ -73,6 +73,23 @@ class Collection(base.Base):
                 return child
         return default
 
+    def get_children(self, names) -> list:
+        """Return the children with the given names
+
+        Subclasses can override this to look the children up together.
+
+        Returns:
+            list: The children in the order of names, None where there is no
+            child with the name
+        """
+        children = []
+        for name in names:
+            try:
+                children.append(self[name])
+            except KeyError:
+                children.append(None)
+        return children
+
     def __getitem__(self, key: str):
         """Return the parent getitem otherwise check if get_child has an item
 
@@ -82,18 +99,15 @@ class Collection(base.Base):
         try:
             return super().__getitem__(key)
         except KeyError as err:
-            try:
-                child_path_names = self.path_names + (key,)
-                cached_child = self.acquire.resource_cache_get(child_path_names)
-            except AttributeError:
-                cached_child = None
-            if cached_child is not None:
-                return cached_child
-            child = self.get_child(key)
+            get_or_create = self.acquire_get("resource_cache_get_or_create")
+            if get_or_create is None:
+                child = self.get_child(key)
+            else:
+                child = get_or_create(
+                    self.path_names + (key,),
+                    lambda: self.get_child(key),
+                    negative=True,
+                )
             if child is not None:
-                try:
-                    self.acquire.resource_cache_save(child)
-                except AttributeError:
-                    pass
                 return child
             raise exc.TraversalKeyError(key) from err
@@ -34,21 +34,47 @@ class TestCollectionSet(TestCase):
         self.assertEqual(self.collection["aaa"].name, "aaa")
         self.assertEqual(self.collection["bbb"].name, "bbb")
 
+    def test_get_children(self):
+        children = self.collection.get_children(["bbb", "zzzz", "aaa"])
+        self.assertEqual(children[0].name, "bbb")
+        self.assertIsNone(children[1])
+        self.assertEqual(children[2].name, "aaa")
+
     def test_cache_get(self):
         self.collection.parent = MagicMock()
         self.collection.parent.parent = None
         self.collection.parent.name = None
-        self.collection.parent.resource_cache_get.return_value = "foo"
+        get_or_create = self.collection.parent.resource_cache_get_or_create
+        get_or_create.return_value = "foo"
         child = self.collection["aaa"]
         self.assertEqual(child, "foo")
-        self.collection.parent.resource_cache_get.assert_called_with(("", "", "aaa"))
+        get_or_create.assert_called_once()
+        self.assertEqual(get_or_create.call_args[0][0], ("", "", "aaa"))
+        self.assertEqual(get_or_create.call_args[1], {"negative": True})
 
     def test_cache_save(self):
         self.collection.parent = MagicMock()
         self.collection.parent.parent = None
-        self.collection.parent.resource_cache_get.return_value = None
+        self.collection.parent.name = None
+        store = {}
+        get_or_create = self.collection.parent.resource_cache_get_or_create
+        get_or_create.side_effect = lambda key, create, negative: store.setdefault(
+            key, create()
+        )
         child = self.collection["aaa"]
-        self.collection.parent.resource_cache_save.assert_called_with(child)
+        self.assertEqual(child.name, "aaa")
+        get_or_create.assert_called_once()
+        self.assertEqual(get_or_create.call_args[0][0], ("", "", "aaa"))
+        self.assertIs(store[("", "", "aaa")], child)
+        self.assertIs(self.collection["aaa"], child)
+
+    def test_cache_miss(self):
+        self.collection.parent = MagicMock()
+        self.collection.parent.parent = None
+        get_or_create = self.collection.parent.resource_cache_get_or_create
+        get_or_create.side_effect = lambda key, create, negative: create()
+        with self.assertRaises(KeyError):
+            self.collection["zzzz"]
 
     def test_filter(self):
         data = self.collection.filter(limit=2, offset=5)
@@ -8,6 +8,8 @@ class Site(resource_cache.ResourceCacheBehaviour, base.Base):
     """A site object which in most cases will be the root object
     """
 
+    acquisition_provides = ("settings", "db_session", "redis")
+
     def __init__(
         self, parent=None, name: str = None, settings=None, db_session=None, redis=None
     ):
@@ -1,7 +1,15 @@
 # -*- coding:utf-8 -*-
 
+from . import cache_trace
+from . import collection
+from . import exc
+from . import record
 from . import site
+from . import testing
+from .behaviour.named_resource import resource
+from .behaviour.workflow import WorkflowBehaviour
 from unittest import TestCase
+from unittest.mock import MagicMock
 
 
 class TestSite(TestCase):
@@ -15,3 +23,152 @@ class TestSite(TestCase):
         self.assertEqual(s.settings, {"a": 1})
         self.assertEqual(s.db_session, db_session)
         self.assertEqual(s.redis, redis)
+
+
+class SiteTestCase(TestCase):
+    """Sites with an items collection whose children are looked up by name
+
+    Names starting with missing have no child unless they have been added.
+    """
+
+    def setUp(self):
+        records = self.records = {}
+        lookups = self.lookups = []
+
+        class Item(record.RecordItem, WorkflowBehaviour):
+            id_fields = ("item_id",)
+            record_type = MagicMock()
+            workflow_transitions = {"publish": {"from": ["draft"], "to": "public"}}
+
+        class Items(collection.Collection):
+            child_type = Item
+
+            def get_child(self, name, default=None):
+                lookups.append(name)
+                if name in records:
+                    return records[name]
+                if name.startswith("missing"):
+                    return default
+                record = MagicMock(item_id=name, title="old", workflow_state="draft")
+                return Item(self, name, record)
+
+            def add(self, name):
+                child = Item(self, name, MagicMock(item_id=name))
+                records[name] = child
+                child.emit("created")
+                return child
+
+        class MySite(site.Site):
+            @resource("items")
+            def get_items(self):
+                return Items(self)
+
+        self.MySite = MySite
+
+
+class TestSiteResourceCacheEviction(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = testing.FakeRedis()
+        self.site = self.MySite(redis=self.redis)
+        self.other_site = self.MySite(redis=self.redis)
+        self.other_site.resource_cache_subscribe()
+
+    def test_edit_evicts(self):
+        item = self.site.resolve_path(["items", "a"])
+        self.assertIs(self.site.resolve_path(["items", "a"]), item)
+        other_item = self.other_site.resolve_path(["items", "a"])
+        item.edit(title="new")
+        self.assertIsNot(self.site.resolve_path(["items", "a"]), item)
+        self.assertIn(("", "items"), self.site.resource_cache)
+        self.other_site.resource_cache_poll_evictions()
+        self.assertIsNot(self.other_site.resolve_path(["items", "a"]), other_item)
+
+    def test_workflow_evicts(self):
+        item = self.site.resolve_path(["items", "a"])
+        item.workflow_action("publish")
+        self.assertNotIn(("", "items", "a"), self.site.resource_cache)
+
+
+class TestSiteNegativeResourceCache(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = self.MySite()
+
+    def test_miss_cached_until_created(self):
+        items = self.site["items"]
+        for i in range(3):
+            with self.assertRaises(exc.TraversalKeyError):
+                self.site.resolve_path(["items", "missing-a"])
+        self.assertEqual(self.lookups, ["missing-a"])
+        items.add("missing-a")
+        self.assertEqual(
+            self.site.resolve_path(["items", "missing-a"]).name, "missing-a"
+        )
+
+
+class TestSiteResolvePathStats(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = self.MySite()
+        self.site.resource_cache_trace = cache_trace.TraceRecorder()
+
+    def test_one_lookup_per_name(self):
+        stats = self.site.resource_cache_stats
+        self.site.resolve_path(["items", "a"])
+        self.assertEqual((stats.hits, stats.misses), (0, 2))
+        self.site.resolve_path(["items", "a"])
+        self.assertEqual((stats.hits, stats.misses), (1, 2))
+        operations = [event[0] for event in self.site.resource_cache_trace.events]
+        self.assertEqual(operations, ["get", "set", "get", "set", "get"])
+
+
+class TestSiteResourceCacheWarm(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = self.MySite()
+        self.new_site = self.MySite()
+
+    def test_manifest(self):
+        self.assertEqual(self.site.resource_cache_manifest(), [])
+        self.site.resolve_path(["items", "b"])
+        self.site.resolve_path(["items", "a"])
+        self.assertEqual(
+            sorted(self.site.resource_cache_manifest()[1:]),
+            [["", "items", "a"], ["", "items", "b"]],
+        )
+        self.assertEqual(self.site.resource_cache_manifest()[0], ["", "items"])
+
+    def test_warm(self):
+        manifest = [
+            ["", "items", "a"],
+            ["", "items", "b"],
+            ["", "items", "missing"],
+            ["", "missing", "c"],
+            ["other", "items"],
+        ]
+        self.assertEqual(self.new_site.resource_cache_warm(manifest), 2)
+        self.assertEqual(
+            sorted(self.new_site.resource_cache.keys()),
+            [("", "items"), ("", "items", "a"), ("", "items", "b")],
+        )
+
+    def test_time_budget(self):
+        now = 0
+
+        def timer():
+            nonlocal now
+            now += 1
+            return now
+
+        self.new_site.resource_cache_timer = timer
+        manifest = [["", "items"]] + [["", "items", str(i)] for i in range(10)]
+        self.assertEqual(self.new_site.resource_cache_warm(manifest, 3), 1)
+        self.assertEqual(list(self.new_site.resource_cache.keys()), [("", "items")])
+
+    def test_warm_get_children(self):
+        items = self.new_site["items"]
+        items.get_children = MagicMock(return_value=[MagicMock(), None])
+        manifest = [["", "items", "a"], ["", "items", "missing"]]
+        self.assertEqual(self.new_site.resource_cache_warm(manifest), 1)
+        items.get_children.assert_called_once_with(["a", "missing"])
@@ -5,7 +5,159 @@ from . import exc
 from . import record
 from typing import Iterable
 
+import base64
+import datetime
+import decimal
+import itertools
+import json
+import random
 import sqlalchemy
+import uuid
+
+
+def primary_key_fields(record_type) -> tuple:
+    """Return the attribute names of the primary key of a mapped record type
+
+    Returns None if record_type is not mapped by SQLAlchemy.
+    """
+    mapper = sqlalchemy.inspect(record_type, raiseerr=False)
+    primary_key = getattr(mapper, "primary_key", None)
+    if primary_key is None:
+        return None
+    return tuple(mapper.get_property_by_column(column).key for column in primary_key)
+
+
+# Criteria and order by clauses built for each query shape, see query_shape
+_query_shapes = {}
+_query_shapes_max_size = 10000
+
+
+def query_shape(key: tuple, build):
+    """Return the clauses cached for a query shape, building them if needed
+
+    A shape is everything about a query except its bound values, so the same
+    clause objects (and so SQLAlchemy's compiled statement cache entry) are
+    reused whenever the shape repeats. The table is dropped when it grows too
+    big.
+
+    Args:
+        key (tuple): The shape, including the record type it applies to
+        build (callable): Called with no arguments to build the clauses
+    """
+    clauses = _query_shapes.get(key)
+    if clauses is None:
+        clauses = build()
+        if len(_query_shapes) >= _query_shapes_max_size:
+            _query_shapes.clear()
+        _query_shapes[key] = clauses
+    return clauses
+
+
+def parse_order_by(order_by) -> list:
+    """Return (field name, descending) pairs for order by expressions
+
+    Expressions are field names optionally followed by " desc".
+    """
+    return [
+        (expression.split(" ")[0], expression.endswith(" desc"))
+        for expression in order_by
+    ]
+
+
+def _encode_cursor_value(value):
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"time": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"decimal": str(value)}
+    if isinstance(value, uuid.UUID):
+        return {"uuid": str(value)}
+    return value
+
+
+_cursor_value_decoders = {
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "decimal": decimal.Decimal,
+    "uuid": uuid.UUID,
+}
+
+
+def _decode_cursor_value(value):
+    if isinstance(value, dict):
+        ((tag, text),) = value.items()
+        return _cursor_value_decoders[tag](text)
+    return value
+
+
+def encode_cursor(
+    order: list, values: list, total: int = None, total_mode: str = None
+) -> str:
+    """Return an opaque keyset pagination cursor
+
+    Args:
+        order (list): The (field name, descending) pairs of the sort order
+        values (list): The values of the order fields of the last record
+        total (int): The total of the first page, carried to later pages
+        total_mode (str): The mode which produced total
+    """
+    data = {
+        "order": [[name, desc] for name, desc in order],
+        "values": [_encode_cursor_value(value) for value in values],
+        "total": [total, total_mode],
+    }
+    text = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: list) -> tuple:
+    """Return the values and total of a cursor made by encode_cursor
+
+    Returns:
+        tuple: (values, total, total_mode)
+
+    Raises:
+        CollectionUnsupportedCriteria: If the cursor is invalid or was made
+            for a different sort order
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(text)
+        values = [_decode_cursor_value(value) for value in data["values"]]
+        cursor_order = [(name, desc) for name, desc in data["order"]]
+        total, total_mode = data.get("total") or (None, None)
+    except (ValueError, TypeError, KeyError, AttributeError, ArithmeticError):
+        raise exc.CollectionUnsupportedCriteria("Invalid cursor") from None
+    if cursor_order != list(order) or len(values) != len(order):
+        raise exc.CollectionUnsupportedCriteria("Cursor is for a different order")
+    return values, total, total_mode
+
+
+def _nullable(field) -> bool:
+    """Test if a mapped attribute may be NULL, True when it can not be told"""
+    return getattr(getattr(field, "expression", None), "nullable", True)
+
+
+def _python_value(field, value):
+    """Coerce value to the Python type the database returns for a mapped attribute
+
+    Values which can not be coerced, or whose type can not be told, are
+    returned unchanged.
+    """
+    try:
+        python_type = field.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+    if value is None or isinstance(value, python_type):
+        return value
+    try:
+        return python_type(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return value
 
 
 class SQLAlchemyItem(record.RecordItem):
@@ -20,7 +172,10 @@ class SQLAlchemyItem(record.RecordItem):
             id (dict): The id of the object as a dictionary
 
         Returns:
-            the domain object for a given record id or None if it doesn't exist
+            the domain object for a given record id or None if it doesn't exist.
+            When the id fields are the primary key of the record type the
+            record is fetched with ``Session.get``, which does not query the
+            database if the record is already in the session
 
         Raises:
             RecordIdTypeError: If the id fields don't match cls.id_fields
@@ -31,12 +186,26 @@ class SQLAlchemyItem(record.RecordItem):
                 f"Can not retrieve record from invalid id: {id}"
             )
         db_session = parent.acquire.db_session
-        result = db_session.query(cls.record_type).filter_by(**id).one_or_none()
+        if cls.id_fields_are_primary_key():
+            # checks the session identity map before querying
+            result = db_session.get(cls.record_type, id)
+        else:
+            result = db_session.query(cls.record_type).filter_by(**id).one_or_none()
         if result is None:
             return None
         else:
             return cls(parent=parent, name=name, record=result)
 
+    @classmethod
+    def id_fields_are_primary_key(cls) -> bool:
+        """Test if id_fields are the primary key of the record type"""
+        value = cls.__dict__.get("_id_fields_are_primary_key")
+        if value is None:
+            primary_key = primary_key_fields(cls.record_type)
+            value = primary_key is not None and set(primary_key) == set(cls.id_fields)
+            cls._id_fields_are_primary_key = value
+        return value
+
 
 class SQLAlchemyCollection(collection.Collection):
     """A collection of SQLAlchemy Records"""
@@ -62,6 +231,77 @@ class SQLAlchemyCollection(collection.Collection):
         """Return the id from a name"""
         raise NotImplementedError()
 
+    def compile_criteria(self, criteria: list) -> tuple:
+        """Return the filter clauses and bound values for a list of criteria
+
+        The clauses use bind parameters for the values and are cached by the
+        shape of the criteria (the types and fields), so only the values
+        change from call to call.
+
+        Returns:
+            tuple: (clauses, params)
+
+        Raises:
+            CollectionUnsupportedCriteria: If a criteria type is unknown
+        """
+        shape = []
+        params = {}
+        for i, criteria_part in enumerate(criteria):
+            criteria_type = criteria_part["type"]
+            if criteria_type not in ("filter_by", "sub_string"):
+                raise exc.CollectionUnsupportedCriteria(
+                    f"Unsupported criteria {criteria_type}"
+                )
+            field_name = criteria_part["field"]
+            value = criteria_part["value"]
+            if criteria_type == "filter_by":
+                if value is None:
+                    criteria_type = "filter_by_none"
+                else:
+                    params[f"criteria_{i}"] = value
+            else:
+                params[f"criteria_{i}"] = value.lower()
+            shape.append((criteria_type, field_name))
+
+        record_type = self.child_type.record_type
+
+        def build():
+            clauses = []
+            for i, (criteria_type, field_name) in enumerate(shape):
+                field = getattr(record_type, field_name)
+                value = sqlalchemy.bindparam(f"criteria_{i}")
+                if criteria_type == "filter_by":
+                    clauses.append(field == value)
+                elif criteria_type == "filter_by_none":
+                    clauses.append(field.is_(None))
+                else:
+                    clauses.append(sqlalchemy.func.lower(field).contains(value))
+            return tuple(clauses)
+
+        clauses = query_shape(("criteria", record_type, tuple(shape)), build)
+        return clauses, params
+
+    def compile_order_by(self, order: list, nulls_last: bool = False) -> tuple:
+        """Return the cached order by clauses for (field name, descending) pairs
+
+        With nulls_last, NULLs of nullable fields sort after every value in
+        either direction, as keyset pagination expects. This is done by first
+        ordering by ``field IS NULL``, which every database supports.
+        """
+        record_type = self.child_type.record_type
+
+        def build():
+            clauses = []
+            for field_name, desc in order:
+                field = getattr(record_type, field_name)
+                if nulls_last and _nullable(field):
+                    clauses.append(field.is_(None))
+                clauses.append(field.desc() if desc else field)
+            return tuple(clauses)
+
+        key = ("order_by", record_type, tuple(order), nulls_last)
+        return query_shape(key, build)
+
     def query(self, criteria: list = []):
         """Return an SQLAlchemy query object selecting the given criteria"""
 
@@ -70,50 +310,226 @@ class SQLAlchemyCollection(collection.Collection):
         query = db_session.query(self.child_type.record_type)
 
         # apply any filters
-        for criteria_part in criteria:
-            if criteria_part["type"] == "filter_by":
-                field_name = criteria_part["field"]
-                field_value = criteria_part["value"]
-                query = query.filter_by(**{field_name: field_value})
-            elif criteria_part["type"] == "sub_string":
-                field_name = criteria_part["field"]
-                field = getattr(self.child_type.record_type, field_name)
-                sub_string = criteria_part["value"]
-                sub_string = sub_string.lower()
-                query = query.filter(
-                    sqlalchemy.func.lower(field).contains(sub_string)
-                )
-            else:
-                raise exc.CollectionUnsupportedCriteria(
-                    f"Unsupported criteria {criteria_part['type']}"
-                )
+        if criteria:
+            clauses, params = self.compile_criteria(criteria)
+            query = query.filter(*clauses).params(**params)
 
         return query
 
+    # Get the total of filter with a count(*) over () window function in the
+    # same query as the page, rather than a separate count query
+    filter_window_total = False
+
+    # How filter counts the total: exact, capped (count at most
+    # filter_total_cap rows) or estimated (see estimate_total)
+    filter_total_mode = "exact"
+    filter_total_cap = 1000
+
+    # The number of primary key values sampled by estimate_total when the
+    # database has no planner estimate to offer
+    estimate_sample_size = 10000
+
+    def count_total(self, query, total_mode: str = "exact") -> tuple:
+        """Count the records selected by query
+
+        Returns:
+            tuple: (total, total_mode) where total_mode is the mode which
+            produced the total. A capped count which did not reach the cap is
+            exact, and a capped total means at least total records.
+
+        Raises:
+            CollectionUnsupportedCriteria: If total_mode is unknown
+        """
+        if total_mode == "exact":
+            return query.count(), "exact"
+        if total_mode == "capped":
+            cap = self.filter_total_cap
+            total = query.limit(cap + 1).count()
+            if total > cap:
+                return cap, "capped"
+            return total, "exact"
+        if total_mode == "estimated":
+            return self.estimate_total(query)
+        raise exc.CollectionUnsupportedCriteria(f"Unsupported total mode {total_mode}")
+
+    def estimate_total(self, query) -> tuple:
+        """Estimate the number of records selected by query
+
+        PostgreSQL's planner estimate is used when available. Other databases
+        (e.g. SQLite) need a single integer primary key: the matches among
+        estimate_sample_size primary key values drawn at random between its
+        minimum and maximum are scaled up to that range. Without one no
+        estimate is made, rather than falling back to an exact count.
+
+        Returns:
+            tuple: (total, total_mode) as for count_total, where the total is
+            None and the total_mode "unavailable" if no estimate can be made
+        """
+        db_session = self.acquire.db_session
+        connection = db_session.connection()
+        dialect = connection.dialect
+        if dialect.name == "postgresql":
+            compiled = query.statement.compile(dialect=dialect)
+            plan = connection.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"]), "estimated"
+
+        record_type = self.child_type.record_type
+        id_fields = self.child_type.id_fields
+        column = getattr(record_type, id_fields[0])
+        if len(id_fields) != 1 or not isinstance(column.type, sqlalchemy.Integer):
+            return None, "unavailable"
+        func = sqlalchemy.func
+        low, high = db_session.query(func.min(column), func.max(column)).one()
+        if low is None:
+            return 0, "exact"
+        population = range(low, high + 1)
+        sample_size = min(self.estimate_sample_size, len(population))
+        # the sampled integers are rendered into the statement rather than
+        # bound, to keep under the bind parameter limits of databases
+        sample = sqlalchemy.bindparam(
+            "estimate_sample",
+            random.sample(population, sample_size),
+            expanding=True,
+            literal_execute=True,
+        )
+        matches = query.filter(column.in_(sample)).count()
+        if sample_size == len(population):
+            return matches, "exact"
+        return round(matches * len(population) / sample_size), "estimated"
+
+    # Page filter results with cursors (keyset pagination) rather than
+    # offsets. Passing a cursor to filter turns this on for the call
+    filter_keyset = False
+
+    def keyset_criterion(self, order: list, nulls: tuple):
+        """Return the criterion selecting the records after a cursor in order
+
+        The criterion matches the order of compile_order_by with nulls_last,
+        where NULLs sort after every value in either direction. The non NULL
+        values of the cursor are bound to the parameters keyset_0, keyset_1
+        and so on. The criterion is cached by order and by which values are
+        NULL.
+
+        Args:
+            order (list): The (field name, descending) pairs of the sort order
+            nulls (tuple): For each order field, whether the cursor value is NULL
+        """
+        record_type = self.child_type.record_type
+
+        def build():
+            fields = [getattr(record_type, name) for name, desc in order]
+            values = [
+                None if null else sqlalchemy.bindparam(f"keyset_{i}", type_=f.type)
+                for i, (f, null) in enumerate(zip(fields, nulls))
+            ]
+            nullable = [_nullable(field) for field in fields]
+            if len({desc for name, desc in order}) == 1 and not any(nullable):
+                # a row value comparison can use a multi column index
+                left = sqlalchemy.tuple_(*fields)
+                right = sqlalchemy.tuple_(*values)
+                return left < right if order[0][1] else left > right
+            clauses = []
+            for i, (name, desc) in enumerate(order):
+                equal = [
+                    fields[j].is_(None) if nulls[j] else fields[j] == values[j]
+                    for j in range(i)
+                ]
+                if nulls[i]:
+                    continue  # nothing sorts after NULL
+                field = fields[i]
+                compare = field < values[i] if desc else field > values[i]
+                if nullable[i]:
+                    compare = sqlalchemy.or_(compare, field.is_(None))
+                clauses.append(sqlalchemy.and_(*equal, compare))
+            return sqlalchemy.or_(*clauses)
+
+        return query_shape(("keyset", record_type, tuple(order), nulls), build)
+
+    def unique_order(self, order: list) -> list:
+        """Return the order with any id_fields it lacks appended, ascending"""
+        order_names = {name for name, desc in order}
+        return order + [
+            (name, False)
+            for name in self.child_type.id_fields
+            if name not in order_names
+        ]
+
+    def keyset_filter(self, query, order: list, values: list):
+        """Return the query filtered to the records after the cursor values"""
+        nulls = tuple(value is None for value in values)
+        params = {
+            f"keyset_{i}": value for i, value in enumerate(values) if value is not None
+        }
+        query = query.filter(self.keyset_criterion(order, nulls))
+        return query.params(**params)
+
     def filter(
         self,
         criteria: list = [],
         order_by: list = None,
         limit: int = None,
         offset: int = None,
+        total_mode: str = None,
+        cursor: str = None,
     ) -> dict:
-        """Return a filtered set of results"""
+        """Return a filtered set of results
+
+        Args:
+            total_mode (str): How to count the total, see count_total. Defaults
+                to filter_total_mode. The result's total_mode says which mode
+                produced the total
+            cursor (str): Return the page after the one which gave this
+                cursor, an empty string for the first page. With a cursor (or
+                filter_keyset) the order is made unique by appending id_fields,
+                NULLs sort last, and the result includes the cursor of the next
+                page, or None at the end. The total is counted on the first page
+                only and carried by the cursor to later pages, so it is of all
+                the results as they were when the walk started
+
+        Raises:
+            CollectionUnsupportedCriteria: If a cursor is invalid or is given
+                with an offset
+        """
 
         query = self.query(criteria)
+        if total_mode is None:
+            total_mode = self.filter_total_mode
+        keyset = cursor is not None or self.filter_keyset
+        if keyset and offset is not None:
+            raise exc.CollectionUnsupportedCriteria(
+                "Can not combine a cursor with an offset"
+            )
+
+        # the sort order, made unique for keyset pagination
+        if order_by is None:
+            order_by = self.default_order_by_fields
+        order = parse_order_by(order_by)
+        total = None
+        if keyset:
+            order = self.unique_order(order)
+            if cursor:
+                # later pages reuse the total of the first page
+                values, total, cursor_total_mode = decode_cursor(cursor, order)
+                if total is not None:
+                    total_mode = cursor_total_mode
+        window_total = (
+            self.filter_window_total and total_mode == "exact" and not cursor
+        )
 
         # Get total records in filter
-        total = query.count()
+        if window_total:
+            query = query.add_columns(sqlalchemy.func.count().over())
+        elif total is None:
+            total, total_mode = self.count_total(query, total_mode)
 
         # set record order
-        record_type = self.child_type.record_type
-        if order_by is None:
-            order_by = self.default_order_by_fields
-        for expression in order_by:
-            field_name = expression.split(" ")[0]
-            field = getattr(record_type, field_name)
-            if expression.endswith(" desc"):
-                field = field.desc()
-            query = query.order_by(field)
+        if keyset and cursor:
+            query = self.keyset_filter(query, order, values)
+        query = query.order_by(*self.compile_order_by(order, nulls_last=keyset))
 
         # set limit and offset paramitors
         if limit is not None:
@@ -123,36 +539,198 @@ class SQLAlchemyCollection(collection.Collection):
 
         # Iterate yielding children
         items = []
-        for rec in query:
+        if window_total:
+            rows = query.all()
+            if rows:
+                total = rows[0][1]
+            else:
+                # the window has no rows to report the total on
+                total = self.query(criteria).count()
+            records = [row[0] for row in rows]
+        else:
+            records = query
+        rec = None
+        for rec in records:
             child = self.child_from_record(rec)
             items.append(child)
 
-        return {"total": total, "items": items}
+        result = {"total": total, "total_mode": total_mode, "items": items}
+        if keyset:
+            next_cursor = None
+            if limit is not None and len(items) == limit and rec is not None:
+                values = [getattr(rec, name) for name, desc in order]
+                next_cursor = encode_cursor(order, values, total, total_mode)
+            result["cursor"] = next_cursor
+        return result
+
+    # Stream iter_children from the database in batches of this many records
+    # rather than loading the whole result first, None to not stream
+    iter_children_batch_size = None
+
+    # Expunge the records of each streamed batch from the session once the
+    # batch has been iterated, to keep the session's memory bounded. The
+    # children of expunged records are detached and can not lazy load
+    iter_children_expunge = False
 
-    def iter_children(self) -> Iterable:
-        """Iterate through all the children"""
+    def iter_children(self, batch_size: int = None) -> Iterable:
+        """Iterate through all the children
+
+        Args:
+            batch_size (int): Stream the records in batches of this size,
+                defaults to iter_children_batch_size
+        """
 
         # Get query and set order
         query = self.query()
-        record_type = self.child_type.record_type
-        for expression in self.default_order_by_fields:
-            field_name = expression.split(" ")[0]
-            field = getattr(record_type, field_name)
-            if expression.endswith(" desc"):
-                field = field.desc()
-            query = query.order_by(field)
+        order = parse_order_by(self.default_order_by_fields)
+        query = query.order_by(*self.compile_order_by(order))
+
+        if batch_size is None:
+            batch_size = self.iter_children_batch_size
+        if batch_size is None:
+            for rec in query:
+                yield self.child_from_record(rec)
+            return
+
+        expunge = self.iter_children_expunge
+        db_session = self.acquire.db_session
+        records = iter(query.yield_per(batch_size))
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            children = [self.child_from_record(rec) for rec in batch]
+            yield from children
+            if expunge:
+                for rec in batch:
+                    db_session.expunge(rec)
+
+    # Look children up by the ids kept in the redis tier of the resource
+    # cache (see resource_cache_redis_enabled). Only worth it when
+    # id_from_name is expensive, e.g. a slug looked up in the database, since
+    # a pure id_from_name is cheaper than the redis round trip
+    resource_cache_redis_ids = False
+
+    def child_from_cached_id(self, name: str):
+        """Return the child using the id stored in the redis resource cache tier
 
-        for rec in query:
-            yield self.child_from_record(rec)
+        The stored type must be the child_type of this collection and the
+        child must still be named ``name``, otherwise the entry is stale.
+
+        Returns:
+            The child or None if there is no valid cached id
+        """
+        redis_get = self.acquire_get("resource_cache_redis_get")
+        if redis_get is None:
+            return None
+        path_names = self.path_names + (name,)
+        cached = redis_get(path_names)
+        if cached is None:
+            return None
+        type_name, id = cached
+        child_type = self.child_type
+        if type_name != f"{child_type.__module__}.{child_type.__qualname__}":
+            return None
+        try:
+            child = child_type.from_id(parent=self, name=name, id=id)
+        except exc.RecordIdTypeError:
+            child = None
+        if child is None or self.name_from_child(child) != name:
+            self.acquire.resource_cache_redis_delete(path_names)
+            return None
+        return child
 
     def get_child(self, name: str, default: object = None):
-        """Return a domain sql alchemy record from the given name"""
+        """Return a domain sql alchemy record from the given name
+
+        With resource_cache_redis_ids the id cached in the redis tier is
+        tried first, and the id is cached there when it had to be worked out.
+        """
+        redis_ids = self.resource_cache_redis_ids
+        if redis_ids:
+            child = self.child_from_cached_id(name)
+            if child is not None:
+                return child
         try:
             id = self.id_from_name(name)
         except TypeError:
             return None
         child = self.child_type.from_id(parent=self, name=name, id=id)
-        return child or default
+        if child is None:
+            return default
+        if redis_ids:
+            redis_set = self.acquire_get("resource_cache_redis_set")
+            if redis_set is not None:
+                redis_set(self.path_names + (name,), child)
+        return child
+
+    # The maximum number of ids in each query of get_children, to keep under
+    # the bind parameter limits of databases
+    get_children_chunk_size = 500
+
+    def get_children(self, names) -> list:
+        """Return the children with the given names using one query per chunk
+
+        Cached children are taken from the resource cache and the rest are
+        fetched with an IN query on id_fields (a tuple IN for composite ids)
+        and added to the resource cache.
+
+        Returns:
+            list: The children in the order of names, None where there is no
+            child with the name
+        """
+        names = list(names)
+        path_names = self.path_names
+        children = {}
+        resource_cache_get = self.acquire_get("resource_cache_get")
+        if resource_cache_get is not None:
+            for name in names:
+                child = resource_cache_get(path_names + (name,))
+                if child is not None:
+                    children[name] = child
+
+        child_type = self.child_type
+        id_fields = tuple(child_type.id_fields)
+        record_type = child_type.record_type
+        columns = [getattr(record_type, f) for f in id_fields]
+        names_by_id = {}
+        for name in names:
+            if name in children:
+                continue
+            try:
+                id = self.id_from_name(name)
+            except TypeError:
+                continue
+            if set(id) != set(id_fields):
+                raise exc.RecordIdTypeError(
+                    f"Can not retrieve record from invalid id: {id}"
+                )
+            # match the values the database will return for the rows
+            key = tuple(_python_value(c, id[f]) for c, f in zip(columns, id_fields))
+            names_by_id.setdefault(key, []).append(name)
+
+        if len(columns) == 1:
+            column = columns[0]
+        else:
+            column = sqlalchemy.tuple_(*columns)
+        db_session = self.acquire.db_session
+        resource_cache_set = self.acquire_get("resource_cache_set")
+        ids = list(names_by_id)
+        chunk_size = self.get_children_chunk_size
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            if len(columns) == 1:
+                chunk = [id[0] for id in chunk]
+            query = db_session.query(record_type).filter(column.in_(chunk))
+            for rec in query:
+                key = tuple(getattr(rec, f) for f in id_fields)
+                for name in names_by_id.get(key, ()):
+                    child = child_type(parent=self, name=name, record=rec)
+                    children[name] = child
+                    if resource_cache_set is not None:
+                        resource_cache_set(path_names + (name,), child)
+
+        return [children.get(name) for name in names]
 
     def add(self, **kwargs):
         """Create a new item"""
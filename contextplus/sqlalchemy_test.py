@@ -1,14 +1,27 @@
 # -*- coding:utf-8 -*-
 
+from . import exc
+from . import site
 from . import sqlalchemy
+from . import testing
 from unittest import TestCase
 from unittest.mock import MagicMock
+from unittest.mock import patch
+
+import base64
+import datetime
+import decimal
+import json
+import sqlalchemy as sa
+import sqlalchemy.orm as orm
+import uuid
 
 
 class TestSQLAlchemyItem(TestCase):
     def test_from_id(self):
         cls = MagicMock()  # we mock the class so we can it as an object factory
         cls.id_fields = ("record_id",)
+        cls.id_fields_are_primary_key.return_value = False
         parent = MagicMock()
         id = {"record_id": "blah"}
 
@@ -27,6 +40,105 @@ class TestSQLAlchemyItem(TestCase):
         cls.assert_called_with(parent=parent, name="foo", record=record)
         self.assertEqual(domain, cls.return_value)
 
+    def test_from_id_primary_key(self):
+        cls = MagicMock()
+        cls.id_fields = ("record_id",)
+        cls.id_fields_are_primary_key.return_value = True
+        parent = MagicMock()
+        id = {"record_id": "blah"}
+
+        domain = sqlalchemy.SQLAlchemyItem.from_id.__func__(cls, parent, "foo", id)
+
+        db_session = parent.acquire.db_session
+        db_session.get.assert_called_with(cls.record_type, id)
+        db_session.query.assert_not_called()
+        record = db_session.get.return_value
+        cls.assert_called_with(parent=parent, name="foo", record=record)
+        self.assertEqual(domain, cls.return_value)
+
+
+class DatabaseTestCase(TestCase):
+    """Tests against records in an in memory SQLite database
+
+    Subclasses declare the record type in declare_record and the records to
+    start with in seed_records. The SQL statements run are kept in statements.
+    """
+
+    def declare_record(self, Base):
+        """Return the record type, declared on Base"""
+        raise NotImplementedError
+
+    def seed_records(self, Record) -> list:
+        return []
+
+    def setUp(self):
+        Base = orm.declarative_base()
+        self.Record = self.declare_record(Base)
+        engine = sa.create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.db_session = orm.Session(engine)
+        self.db_session.add_all(self.seed_records(self.Record))
+        self.db_session.commit()
+        self.site = site.Site(name="", db_session=self.db_session)
+        self.statements = []
+        sa.event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: self.statements.append(statement),
+        )
+
+
+class TestSQLAlchemyItemPrimaryKey(DatabaseTestCase):
+    def declare_record(self, Base):
+        class Record(Base):
+            __tablename__ = "record"
+            group_id = sa.Column(sa.Integer, primary_key=True)
+            record_number = sa.Column("number", sa.Integer, primary_key=True)
+            slug = sa.Column(sa.String)
+
+        return Record
+
+    def seed_records(self, Record):
+        return [Record(group_id=1, record_number=2, slug="a")]
+
+    def setUp(self):
+        super().setUp()
+
+        class Item(sqlalchemy.SQLAlchemyItem):
+            record_type = self.Record
+            id_fields = ("group_id", "record_number")
+
+        class ItemBySlug(Item):
+            id_fields = ("slug",)
+
+        self.Item = Item
+        self.ItemBySlug = ItemBySlug
+
+    def test_primary_key_fields(self):
+        self.assertEqual(
+            sqlalchemy.primary_key_fields(self.Item.record_type),
+            ("group_id", "record_number"),
+        )
+        self.assertIsNone(sqlalchemy.primary_key_fields(object))
+        self.assertTrue(self.Item.id_fields_are_primary_key())
+        self.assertFalse(self.ItemBySlug.id_fields_are_primary_key())
+
+    def test_identity_map(self):
+        id = {"group_id": 1, "record_number": 2}
+        item = self.Item.from_id(self.site, "a", id)
+        self.assertEqual(item.id, id)
+        self.assertEqual(len(self.statements), 1)
+        self.Item.from_id(self.site, "a", id)
+        self.assertEqual(len(self.statements), 1)
+        self.assertIsNone(
+            self.Item.from_id(self.site, "b", {"group_id": 1, "record_number": 3})
+        )
+
+    def test_not_primary_key(self):
+        item = self.ItemBySlug.from_id(self.site, "a", {"slug": "a"})
+        self.assertEqual(item._record.record_number, 2)
+        self.assertIsNone(self.ItemBySlug.from_id(self.site, "b", {"slug": "b"}))
+
 
 class TestDomainSQLAlchemyRecordCollection(TestCase):
     def test_default_order_by_fields(self):
@@ -58,9 +170,10 @@ class TestDomainSQLAlchemyRecordCollection(TestCase):
         db_session = collection.acquire.db_session
         db_session.query.assert_called_with(collection.child_type.record_type)
         q = db_session.query.return_value
-        q.filter_by.assert_called_with(record_id="abc")
-        q = q.filter_by.return_value
-        self.assertEqual(query, q)
+        q.filter.assert_called_once()
+        q = q.filter.return_value
+        q.params.assert_called_with(criteria_0="abc")
+        self.assertEqual(query, q.params.return_value)
 
     def test_filter(self):
         collection = sqlalchemy.SQLAlchemyCollection()
@@ -92,6 +205,21 @@ class TestDomainSQLAlchemyRecordCollection(TestCase):
             ],
         )
 
+    def test_estimate_total_postgresql(self):
+        collection = sqlalchemy.SQLAlchemyCollection()
+        collection.parent = MagicMock()
+        connection = collection.acquire.db_session.connection.return_value
+        connection.dialect.name = "postgresql"
+        result = connection.exec_driver_sql.return_value
+        result.scalar.return_value = [{"Plan": {"Plan Rows": 5000}}]
+        query = MagicMock()
+        compiled = query.statement.compile.return_value
+        compiled.string = "SELECT 1"
+        self.assertEqual(collection.estimate_total(query), (5000, "estimated"))
+        connection.exec_driver_sql.assert_called_with(
+            "EXPLAIN (FORMAT JSON) SELECT 1", compiled.params
+        )
+
     def test_iter_children(self):
         collection = sqlalchemy.SQLAlchemyCollection()
         collection.query = MagicMock()
@@ -113,3 +241,347 @@ class TestDomainSQLAlchemyRecordCollection(TestCase):
                 collection.child_from_record.return_value,
             ],
         )
+
+
+class TestSQLAlchemyCollectionCachedId(TestCase):
+    class Item(sqlalchemy.SQLAlchemyItem):
+        id_fields = ("item_id",)
+
+    class Collection(sqlalchemy.SQLAlchemyCollection):
+        resource_cache_redis_ids = True
+
+        def name_from_child(self, child):
+            return child.name
+
+    class Site(site.Site):
+        resource_cache_redis_enabled = True
+
+    def setUp(self):
+        self.redis = testing.FakeRedis()
+        self.site = self.Site(name="", redis=self.redis)
+        self.collection = self.Collection(parent=self.site, name="items")
+        self.collection.child_type = self.Item
+        self.collection.id_from_name = MagicMock(
+            side_effect=lambda name: {"item_id": int(name)}
+        )
+        self.from_id = MagicMock(
+            side_effect=lambda parent, name, id: self.Item(
+                parent, name, MagicMock(**id)
+            )
+        )
+        from_id_patch = patch.object(self.Item, "from_id", self.from_id)
+        from_id_patch.start()
+        self.addCleanup(from_id_patch.stop)
+
+    def test_get_child(self):
+        child = self.collection.get_child("1")
+        self.assertEqual(child.id, {"item_id": 1})
+        self.assertEqual(self.collection.id_from_name.call_count, 1)
+
+        # another process resolves the name from the cached id
+        site2 = self.Site(name="", redis=self.redis)
+        collection2 = self.Collection(parent=site2, name="items")
+        collection2.child_type = self.Item
+        collection2.id_from_name = MagicMock()
+        child = collection2.get_child("1")
+        self.assertEqual(child.name, "1")
+        collection2.id_from_name.assert_not_called()
+        self.from_id.assert_called_with(
+            parent=collection2, name="1", id={"item_id": 1}
+        )
+
+    def test_disabled(self):
+        self.collection.resource_cache_redis_ids = False
+        self.redis.get = MagicMock()
+        self.redis.set = MagicMock()
+        self.assertEqual(self.collection.get_child("1").name, "1")
+        self.redis.get.assert_not_called()
+        self.redis.set.assert_not_called()
+
+    def test_wrong_type(self):
+        self.collection.get_child("1")
+        self.collection.child_type = type("Other", (self.Item,), {})
+        self.assertIsNone(self.collection.child_from_cached_id("1"))
+
+    def test_stale(self):
+        self.collection.get_child("1")
+        self.from_id.side_effect = None
+        self.from_id.return_value = None
+        self.assertIsNone(self.collection.child_from_cached_id("1"))
+        key = self.site.resource_cache_redis_key(("", "items", "1"))
+        self.assertIsNone(self.redis.get(key))
+
+
+class TestSQLAlchemyCollectionGetChildren(DatabaseTestCase):
+    def declare_record(self, Base):
+        class Record(Base):
+            __tablename__ = "record"
+            group_id = sa.Column(sa.Integer, primary_key=True)
+            record_number = sa.Column(sa.Integer, primary_key=True)
+
+        return Record
+
+    def seed_records(self, Record):
+        return [Record(group_id=i % 2, record_number=i) for i in range(10)]
+
+    def setUp(self):
+        super().setUp()
+
+        class Item(sqlalchemy.SQLAlchemyItem):
+            record_type = self.Record
+            id_fields = ("record_number",)
+
+        class GroupItem(Item):
+            id_fields = ("group_id", "record_number")
+
+        class Items(sqlalchemy.SQLAlchemyCollection):
+            child_type = Item
+
+            def id_from_name(self, name):
+                return {"record_number": int(name)}
+
+        class GroupItems(sqlalchemy.SQLAlchemyCollection):
+            child_type = GroupItem
+
+            def id_from_name(self, name):
+                group_id, record_number = name.split("-")
+                return {"group_id": int(group_id), "record_number": int(record_number)}
+
+        self.items = Items(parent=self.site, name="items")
+        self.group_items = GroupItems(parent=self.site, name="group-items")
+
+    def test_get_children(self):
+        self.items.get_children_chunk_size = 3
+        names = ["7", "1", "11", "3", "5", "2"]
+        children = self.items.get_children(names)
+        self.assertEqual(
+            [c and c.name for c in children], ["7", "1", None, "3", "5", "2"]
+        )
+        self.assertEqual(children[0].id, {"record_number": 7})
+        self.assertEqual(len(self.statements), 2)
+
+        # the children are cached
+        self.assertIs(self.site.resource_cache_get(("", "items", "7")), children[0])
+        self.assertEqual(self.items.get_children(["7", "1"]), children[:2])
+        self.assertEqual(len(self.statements), 2)
+
+    def test_string_id(self):
+        self.items.id_from_name = lambda name: {"record_number": name}
+        children = self.items.get_children(["3", "4", "x"])
+        self.assertEqual([c and c.name for c in children], ["3", "4", None])
+
+    def test_composite(self):
+        children = self.group_items.get_children(["1-3", "0-3", "0-4"])
+        self.assertEqual([c and c.name for c in children], ["1-3", None, "0-4"])
+        self.assertEqual(len(self.statements), 1)
+
+
+class TestSQLAlchemyCollectionFilter(DatabaseTestCase):
+    def declare_record(self, Base):
+        class Record(Base):
+            __tablename__ = "record"
+            record_id = sa.Column(sa.Integer, primary_key=True)
+            title = sa.Column(sa.String)
+            score = sa.Column(sa.Integer)
+
+        return Record
+
+    def seed_records(self, Record):
+        return [
+            Record(record_id=i, title=f"Item {i}", score=i % 3) for i in range(25)
+        ]
+
+    def setUp(self):
+        super().setUp()
+
+        class Item(sqlalchemy.SQLAlchemyItem):
+            record_type = self.Record
+            id_fields = ("record_id",)
+
+        class Items(sqlalchemy.SQLAlchemyCollection):
+            child_type = Item
+
+            def name_from_child(self, child):
+                return str(child.id["record_id"])
+
+        self.items = Items(parent=self.site, name="items")
+
+    def names(self, data):
+        return [item.name for item in data["items"]]
+
+    def test_window_total(self):
+        self.items.filter_window_total = True
+        criteria = [{"type": "sub_string", "field": "title", "value": "item 1"}]
+        data = self.items.filter(criteria, order_by=["record_id desc"], limit=3)
+        self.assertEqual(data["total"], 11)
+        self.assertEqual(self.names(data), ["19", "18", "17"])
+        self.assertEqual(len(self.statements), 1)
+
+    def test_window_total_empty_page(self):
+        self.items.filter_window_total = True
+        data = self.items.filter(limit=10, offset=30)
+        self.assertEqual(data, {"total": 25, "total_mode": "exact", "items": []})
+        self.assertEqual(len(self.statements), 2)
+
+    def test_capped_total(self):
+        self.items.filter_total_cap = 10
+        data = self.items.filter(limit=2, total_mode="capped")
+        self.assertEqual((data["total"], data["total_mode"]), (10, "capped"))
+        self.assertEqual(self.names(data), ["0", "1"])
+        criteria = [{"type": "filter_by", "field": "score", "value": 1}]
+        data = self.items.filter(criteria, limit=2, total_mode="capped")
+        self.assertEqual((data["total"], data["total_mode"]), (8, "exact"))
+
+    def test_estimated_total(self):
+        self.items.estimate_sample_size = 10
+        criteria = [{"type": "filter_by", "field": "score", "value": 0}]
+        self.items.filter_total_mode = "estimated"
+        with patch("random.sample", return_value=list(range(10))) as sample:
+            data = self.items.filter(criteria, limit=2)
+        sample.assert_called_with(range(0, 25), 10)
+        # 4 of the 10 sampled records have a score of 0
+        self.assertEqual((data["total"], data["total_mode"]), (10, "estimated"))
+        # min and max, the sample and the page, with no count of the table
+        self.assertEqual(len(self.statements), 3)
+        # the sample is not sent as bind parameters
+        self.assertIn("IN (0, 1, 2, 3, 4, 5, 6, 7, 8, 9)", self.statements[1])
+
+        self.items.estimate_sample_size = 100
+        data = self.items.filter(criteria, limit=2)
+        self.assertEqual((data["total"], data["total_mode"]), (9, "exact"))
+
+    def test_estimated_total_unavailable(self):
+        self.items.child_type.id_fields = ("title",)
+        total = self.items.estimate_total(self.items.query())
+        self.assertEqual(total, (None, "unavailable"))
+        self.assertEqual(self.statements, [])
+
+    def test_unknown_total_mode(self):
+        with self.assertRaises(exc.CollectionUnsupportedCriteria):
+            self.items.filter(total_mode="guess")
+
+    def test_iter_children_stream(self):
+        self.items.iter_children_batch_size = 4
+        self.items.iter_children_expunge = True
+        db_session = self.site.db_session
+        names = []
+        for child in self.items.iter_children():
+            names.append(child.name)
+            self.assertIn(child._record, db_session)
+            self.assertLessEqual(len(db_session.identity_map), 4)
+        self.assertEqual(names, [str(i) for i in range(25)])
+        self.assertEqual(len(db_session.identity_map), 0)
+
+    def test_iter_children_batch_size(self):
+        children = list(self.items.iter_children(batch_size=10))
+        self.assertEqual(len(children), 25)
+        self.assertIn(children[0]._record, self.site.db_session)
+
+    def test_criteria_shape_cached(self):
+        criteria = [
+            {"type": "filter_by", "field": "score", "value": 1},
+            {"type": "sub_string", "field": "title", "value": "Item 1"},
+        ]
+        clauses, params = self.items.compile_criteria(criteria)
+        self.assertEqual(params, {"criteria_0": 1, "criteria_1": "item 1"})
+        criteria[0]["value"] = 2
+        other_clauses, params = self.items.compile_criteria(criteria)
+        self.assertIs(other_clauses, clauses)
+        self.assertEqual(params, {"criteria_0": 2, "criteria_1": "item 1"})
+        self.assertEqual(
+            self.names(self.items.filter(criteria)), ["11", "14", "17"]
+        )
+        order = [("score", True)]
+        self.assertIs(
+            self.items.compile_order_by(order), self.items.compile_order_by(order)
+        )
+
+    def test_criteria_none(self):
+        criteria = [{"type": "filter_by", "field": "title", "value": None}]
+        self.assertEqual(self.items.filter(criteria)["total"], 0)
+        self.site.db_session.get(self.items.child_type.record_type, 3).title = None
+        self.assertEqual(self.names(self.items.filter(criteria)), ["3"])
+
+    def test_unsupported_criteria(self):
+        criteria = [{"type": "regexp", "field": "title", "value": "x"}]
+        with self.assertRaises(exc.CollectionUnsupportedCriteria):
+            self.items.query(criteria)
+
+    def walk(self, **kwargs):
+        names = []
+        cursor = ""
+        while cursor is not None:
+            data = self.items.filter(cursor=cursor, **kwargs)
+            self.assertEqual(data["total"], 25)
+            names.extend(self.names(data))
+            cursor = data["cursor"]
+        return names
+
+    def test_keyset(self):
+        names = self.walk(order_by=["score desc"], limit=4)
+        expected = sorted(range(25), key=lambda i: (-(i % 3), i))
+        self.assertEqual(names, [str(i) for i in expected])
+
+        names = self.walk(order_by=["title"], limit=10)
+        self.assertEqual(names, sorted(names, key=lambda name: f"Item {name}"))
+        self.assertEqual(len(names), 25)
+
+    def test_keyset_nulls(self):
+        db_session = self.site.db_session
+        record_type = self.items.child_type.record_type
+        for i in range(0, 25, 3):
+            db_session.get(record_type, i).score = None
+        for order_by in (["score desc"], ["score"], ["score desc", "title"]):
+            names = self.walk(order_by=order_by, limit=4)
+            self.assertEqual(sorted(names, key=int), [str(i) for i in range(25)])
+            scores = [db_session.get(record_type, int(n)).score for n in names]
+            self.assertEqual(scores[-9:], [None] * 9)
+
+    def test_keyset_total_counted_once(self):
+        data = self.items.filter(cursor="", limit=10)
+        self.assertEqual(len(self.statements), 2)
+        self.items.filter(cursor=data["cursor"], limit=10)
+        self.assertEqual(len(self.statements), 3)
+
+    def test_keyset_window_total(self):
+        self.items.filter_window_total = True
+        self.assertEqual(len(self.walk(limit=10)), 25)
+
+    def test_keyset_default(self):
+        self.items.filter_keyset = True
+        data = self.items.filter(limit=30)
+        self.assertEqual(len(data["items"]), 25)
+        self.assertIsNone(data["cursor"])
+
+    def test_keyset_errors(self):
+        with self.assertRaises(exc.CollectionUnsupportedCriteria):
+            self.items.filter(cursor="", offset=10)
+        with self.assertRaises(exc.CollectionUnsupportedCriteria):
+            self.items.filter(cursor="not a cursor")
+        cursor = self.items.filter(cursor="", limit=1)["cursor"]
+        with self.assertRaises(exc.CollectionUnsupportedCriteria):
+            self.items.filter(cursor=cursor, order_by=["title"])
+
+
+class TestCursor(TestCase):
+    def test_round_trip(self):
+        order = [("created", True), ("price", False), ("uid", False)]
+        values = [
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+            decimal.Decimal("1.50"),
+            uuid.UUID(int=1),
+        ]
+        cursor = sqlalchemy.encode_cursor(order, values, 10, "exact")
+        self.assertNotIn("=", cursor)
+        self.assertEqual(
+            sqlalchemy.decode_cursor(cursor, order), (values, 10, "exact")
+        )
+
+    def test_tampered(self):
+        order = [("price", False)]
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({"order": [["price", False]], "values": [{"decimal": "abc"}]})
+            .encode("utf-8")
+        ).decode("ascii")
+        with self.assertRaises(exc.CollectionUnsupportedCriteria):
+            sqlalchemy.decode_cursor(cursor, order)
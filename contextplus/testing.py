@@ -0,0 +1,129 @@
+# -*- coding:utf-8 -*-
+"""Helpers for testing code which uses contextplus"""
+
+import time
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return str(value).encode("utf-8")
+
+
+class FakeRedis(object):
+    """An in memory stand in for a ``redis.Redis`` client
+
+    Supports the small subset of commands used by contextplus: get, set, mget,
+    delete, publish and pubsub. Values are returned as bytes like redis does.
+    Several clients can share the same server by passing the same FakeRedis
+    instance around, which is how separate worker processes are simulated.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.subscriptions = []
+
+    def _expire(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def get(self, key):
+        key = _to_bytes(key)
+        self._expire(key)
+        return self.data.get(key)
+
+    def mget(self, keys, *args):
+        if isinstance(keys, (str, bytes)):
+            keys = [keys]
+        return [self.get(key) for key in [*keys, *args]]
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        key = _to_bytes(key)
+        self._expire(key)
+        if nx and key in self.data:
+            return None
+        self.data[key] = _to_bytes(value)
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        elif px is not None:
+            self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    def delete(self, *keys):
+        count = 0
+        for key in keys:
+            key = _to_bytes(key)
+            self._expire(key)
+            if key in self.data:
+                del self.data[key]
+                self.expires.pop(key, None)
+                count += 1
+        return count
+
+    def publish(self, channel, message):
+        channel = _to_bytes(channel)
+        count = 0
+        for pubsub in self.subscriptions:
+            if channel in pubsub.channels:
+                pubsub.messages.append(
+                    {
+                        "type": "message",
+                        "pattern": None,
+                        "channel": channel,
+                        "data": _to_bytes(message),
+                    }
+                )
+                count += 1
+        return count
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self, ignore_subscribe_messages)
+
+
+class FakePubSub(object):
+    """The pubsub object returned by FakeRedis.pubsub"""
+
+    def __init__(self, redis, ignore_subscribe_messages=False):
+        self.redis = redis
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.channels = set()
+        self.messages = []
+        redis.subscriptions.append(self)
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            channel = _to_bytes(channel)
+            self.channels.add(channel)
+            if not self.ignore_subscribe_messages:
+                self.messages.append(
+                    {
+                        "type": "subscribe",
+                        "pattern": None,
+                        "channel": channel,
+                        "data": len(self.channels),
+                    }
+                )
+
+    def unsubscribe(self, *channels):
+        for channel in channels or list(self.channels):
+            self.channels.discard(_to_bytes(channel))
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        while self.messages:
+            message = self.messages.pop(0)
+            if message["type"] == "message":
+                return message
+            if not (ignore_subscribe_messages or self.ignore_subscribe_messages):
+                return message
+        return None
+
+    def close(self):
+        self.unsubscribe()
+        if self in self.redis.subscriptions:
+            self.redis.subscriptions.remove(self)
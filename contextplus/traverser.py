@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+"""A Pyramid traverser which resolves a request path in one go
+
+Register it for the root object type of a Pyramid application::
+
+    config.add_traverser(Traverser, Site)
+
+The traverser uses ``traverse_path`` on the root, so the deepest cached
+prefix of the request path is found with a resource cache probe and only
+the remaining names are traversed. Like Pyramid's traverser it stops at a
+resource without ``__getitem__`` and honours the ``X-Vhm-Root`` virtual root
+header for paths which do not come from a route's ``traverse`` pattern.
+"""
+
+VH_ROOT_KEY = "HTTP_X_VHM_ROOT"
+
+
+def split_path(path: str) -> tuple:
+    """Split a path into a tuple of names, normalising ``.`` and ``..``"""
+    names = []
+    for name in path.split("/"):
+        if not name or name == ".":
+            continue
+        elif name == "..":
+            if names:
+                names.pop()
+        else:
+            names.append(name)
+    return tuple(names)
+
+
+class Traverser(object):
+    """A drop in replacement for Pyramid's ResourceTreeTraverser"""
+
+    VIEW_SELECTOR = "@@"
+
+    def __init__(self, root):
+        self.root = root
+
+    def get_path_names(self, request) -> tuple:
+        """Return the names to traverse from the request"""
+        matchdict = getattr(request, "matchdict", None)
+        if matchdict is not None and "traverse" in matchdict:
+            path = matchdict["traverse"]
+            if isinstance(path, str):
+                return split_path(path)
+            return tuple(path)
+        return split_path(request.path_info or "/")
+
+    def get_virtual_root_names(self, request) -> tuple:
+        """Return the names of the virtual root from the request, if any"""
+        matchdict = getattr(request, "matchdict", None)
+        if matchdict is not None and "traverse" in matchdict:
+            return ()
+        environ = getattr(request, "environ", None) or {}
+        return split_path(environ.get(VH_ROOT_KEY, "/"))
+
+    def __call__(self, request) -> dict:
+        root = self.root
+        vroot_names = self.get_virtual_root_names(request)
+        names = vroot_names + self.get_path_names(request)
+
+        # Names from an explicit view selector onwards are not traversed
+        end = len(names)
+        for i, name in enumerate(names):
+            if name.startswith(self.VIEW_SELECTOR):
+                end = i
+                break
+
+        context, traversed = root.traverse_path(names[:end])
+        remaining = names[traversed:]
+        if remaining:
+            view_name = remaining[0]
+            if view_name.startswith(self.VIEW_SELECTOR):
+                view_name = view_name[len(self.VIEW_SELECTOR):]
+            subpath = remaining[1:]
+        else:
+            view_name = ""
+            subpath = ()
+
+        virtual_root = root
+        if vroot_names and traversed >= len(vroot_names):
+            virtual_root = root.traverse_path(vroot_names)[0]
+
+        return {
+            "context": context,
+            "view_name": view_name,
+            "subpath": subpath,
+            "traversed": names[:traversed],
+            "virtual_root": virtual_root,
+            "virtual_root_path": vroot_names,
+            "root": root,
+        }
@@ -0,0 +1,61 @@
+# -*- coding:utf-8 -*-
+
+from . import traverser
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+
+class TestSplitPath(TestCase):
+    def test_split_path(self):
+        self.assertEqual(traverser.split_path("/"), ())
+        self.assertEqual(traverser.split_path("/a//b/./c/../d/"), ("a", "b", "d"))
+
+
+class TestTraverser(TestCase):
+    def setUp(self):
+        self.root = MagicMock()
+        self.context = MagicMock()
+        self.traverser = traverser.Traverser(self.root)
+
+    def test_traverse_all(self):
+        self.root.traverse_path.return_value = (self.context, 2)
+        request = MagicMock(matchdict=None, path_info="/a/b", environ={})
+        result = self.traverser(request)
+        self.root.traverse_path.assert_called_with(("a", "b"))
+        self.assertIs(result["context"], self.context)
+        self.assertEqual(result["view_name"], "")
+        self.assertEqual(result["subpath"], ())
+        self.assertEqual(result["traversed"], ("a", "b"))
+        self.assertIs(result["root"], self.root)
+        self.assertIs(result["virtual_root"], self.root)
+        self.assertEqual(result["virtual_root_path"], ())
+
+    def test_view_name(self):
+        self.root.traverse_path.return_value = (self.context, 1)
+        request = MagicMock(matchdict=None, path_info="/a/edit/x/y", environ={})
+        result = self.traverser(request)
+        self.assertEqual(result["view_name"], "edit")
+        self.assertEqual(result["subpath"], ("x", "y"))
+        self.assertEqual(result["traversed"], ("a",))
+
+    def test_view_selector(self):
+        self.root.traverse_path.return_value = (self.context, 1)
+        request = MagicMock(matchdict={"traverse": "a/@@edit/x"})
+        result = self.traverser(request)
+        self.root.traverse_path.assert_called_with(("a",))
+        self.assertEqual(result["view_name"], "edit")
+        self.assertEqual(result["subpath"], ("x",))
+
+    def test_virtual_root(self):
+        vroot = MagicMock()
+        self.root.traverse_path.side_effect = [(self.context, 3), (vroot, 2)]
+        request = MagicMock(
+            matchdict=None, path_info="/b", environ={"HTTP_X_VHM_ROOT": "/site/a"}
+        )
+        result = self.traverser(request)
+        self.root.traverse_path.assert_any_call(("site", "a", "b"))
+        self.root.traverse_path.assert_called_with(("site", "a"))
+        self.assertIs(result["context"], self.context)
+        self.assertEqual(result["traversed"], ("site", "a", "b"))
+        self.assertIs(result["virtual_root"], vroot)
+        self.assertEqual(result["virtual_root_path"], ("site", "a"))